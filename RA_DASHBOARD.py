@@ -1,18 +1,24 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.express as px
-from plotly.subplots import make_subplots
-from itertools import combinations
-from collections import Counter
-import zipfile
 import io
 import os
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.metrics import silhouette_score
+import uuid
 from streamlit_extras.stylable_container import stylable_container
+from ingestion import read_ra_csv, memory_report
+from analytics import split_payin_payout
+from cache import FrameCache, ResultCache, content_digest, file_digest
+from cube import RACube
+from timeseries import GRANULARITIES, RASeries
+from ra_stream import stream_ra_cube
+from store import RAStore
+from perf import Profiler
+from figures import pie, payload_bytes
+from sql_backend import DuckDBRA, compare_kpis, AVAILABLE as SQL_AVAILABLE
+from jobs import JobRunner
+from report import REPORTS_DIR, list_reports, load_report
+from reconcile import KEYS, STATUSES, reconcile, reconciliation_summary, exceptions
+from anomalies import AMOUNT, BURST, FAILURES, VOLUME, detect_anomalies
 
 
 # --- Configuration de la page ---
@@ -72,51 +78,407 @@ def metric_card(title, value, bg_color):
     """
     return html
 
-# --- Chargement du fichier ---
-file_path = st.sidebar.file_uploader("Choisir un fichier CSV", type="csv")
-if file_path is not None:
-    data = pd.read_csv(file_path, encoding="ISO-8859-1")
-else:
-    st.sidebar.write("Veuillez charger un fichier CSV.")
-    st.stop()
-        
-# --- Nettoyage & transformation ---
-def extractday(dated):
-    parts=dated.split(' ')
-    return parts[0]
-data['Date']= data['created_at'].apply(extractday)
+# --- Instrumentation optionnelle (panneau « Performance ») ---
+perf_panel = st.sidebar.toggle("Performance", help="Temps et lignes de chaque étape")
+# tracemalloc ralentit nettement les calculs : mesure mémoire activée séparément
+perf_memory = perf_panel and st.sidebar.checkbox("Mesurer le pic mémoire (plus lent)")
+prof = Profiler(enabled=perf_panel, memory=perf_memory)
 
-data["amount"] = pd.to_numeric(data["amount"], errors="coerce")
-data = data.drop_duplicates(subset='transaction_id', keep='first')
-payin=data[data['operation_origin']=='payment']
-payout=data[data['operation_origin']=='transfer']
+def plotly_chart(fig, name, **kwargs):
+    # Sérialisation Plotly et envoi au navigateur, mesurés comme une étape
+    with prof.stage(f"figure : {name}") as rec:
+        if prof.enabled:
+            rec["taille_figure_ko"] = payload_bytes(fig) / 1024
+        st.plotly_chart(fig, **kwargs)
 
+# --- Chargement du fichier ---
+frame_cache = FrameCache()
+# Agrégats partagés entre sessions et processus du serveur (voir cache.py) ;
+# une seule instance par processus : le niveau mémoire et les compteurs survivent aux reruns
+@st.cache_resource(show_spinner=False)
+def result_cache():
+    return ResultCache()
+
+results = result_cache()
+
+# Lecture, nettoyage et compaction une seule fois par fichier (cache disque) ; sans appel
+# Streamlit : exécuté aussi par le job d'arrière-plan
+def read_ra(digest, raw_bytes):
+    key = f"ra-{digest}"
+    data = frame_cache.get(key)
+    if data is None:
+        data = read_ra_csv(io.BytesIO(raw_bytes))
+        frame_cache.put(key, data)
+    return data
+
+@st.cache_data(show_spinner=True)
+def load_ra(digest, _raw_bytes):
+    with prof.stage("lecture et nettoyage CSV") as rec:
+        data = read_ra(digest, _raw_bytes)
+        rec["lignes_sortie"] = len(data)
+    return data
+
+# Mode streaming : le fichier est lu par blocs et seuls les agrégats sont gardés en mémoire
+@st.cache_data(show_spinner=True)
+def stream_ra(digest, _source, dedupe):
+    return stream_ra_cube(_source, dedupe=dedupe)
+
+# Moteur DuckDB : la base est une ressource partagée entre sessions (non sérialisable)
+@st.cache_resource(show_spinner=True)
+def ra_sql(digest, _data=None, _path=None):
+    return DuckDBRA(data=_data, path=_path)
+
+# KPI et répartitions de la vue globale ; `scope` identifie le fichier, le moteur et les filtres
+@results.memoize
+def ra_overview(scope, _cube, _filters):
+    return (_cube.kpis(_filters),
+            _cube.rollup(["provider_name"], ["amount"], _filters),
+            _cube.rollup(["statut"], ["amount"], _filters),
+            _cube.rollup(["country"], ["amount"], _filters))
+
+# Rapprochement : résumé par provider et transactions à traiter ; `scope` identifie les deux jeux
+@results.memoize
+def ra_reconciliation(scope, _left, _right, key, amount_tol, window_minutes):
+    result = reconcile(_left, _right, key, amount_tol, pd.Timedelta(minutes=window_minutes) if window_minutes else None)
+    return reconciliation_summary(result), exceptions(result)
+
+# Détection d'anomalies : transactions et tranches de temps signalées (voir anomalies.py)
+@results.memoize
+def ra_anomalies(scope, _data, threshold, window_minutes, burst_seconds, source):
+    return detect_anomalies(_data, threshold=threshold, window=f"{window_minutes}min",
+                            burst_window=f"{burst_seconds}s", source=source)
+
+# Évolution dans le temps : lue dans les cuboïdes heure/jour/semaine/mois de la série
+@results.memoize
+def ra_trend(scope, granularity, measure, by, _series, _filters):
+    return _series.trend(granularity, measure, by, _filters)
+
+# --- Précalculs en arrière-plan (voir jobs.py) ---
+@st.cache_resource(show_spinner=False)
+def job_runner():
+    return JobRunner()
+
+def default_scope(digest):
+    # Vue initiale : moteur pandas, aucun filtre (même clé que l'appel de la vue globale)
+    return (digest, "pandas", None, ())
+
+def precompute_steps(digest, raw_bytes):
+    return [
+        ("donnees", lambda r: read_ra(digest, raw_bytes)),
+        ("cube", lambda r: RACube(r["donnees"])),
+        ("vue globale", lambda r: ra_overview(default_scope(digest), r["cube"], {})),
+        ("séries temporelles", lambda r: RASeries(r["donnees"])),
+    ]
+
+# Identifiant de session : un nouveau fichier libère le job du précédent
+job_owner = st.session_state.setdefault("job_owner", uuid.uuid4().hex)
+job = None
+
+def show_progress(job, slot):
+    fraction, current = job.progress()
+    slot.progress(fraction, text=f"Précalculs : {current or 'terminés'}")
+
+# Extractions lues directement sur le serveur : seulement sous ce répertoire (option masquée sinon)
+EXTRACTIONS_DIR = os.environ.get("REPORTING_EXTRACTIONS_DIR", "")
+
+def within_root(root, path):
+    # Chemin résolu (liens symboliques compris) contenu dans le répertoire autorisé
+    root, path = os.path.realpath(root), os.path.realpath(path)
+    return os.path.commonpath([root, path]) == root and os.path.isfile(path)
+
+@st.cache_data(show_spinner=False, ttl=60)
+def server_extractions(root):
+    """CSV disponibles sous `root`, en chemins relatifs."""
+    found = []
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            if name.lower().endswith(".csv") and within_root(root, path):
+                found.append(os.path.relpath(path, root))
+    return sorted(found)
+
+# Rapport précalculé : le cube est reconstruit à partir des agrégats écrits par report.py
+@st.cache_data(show_spinner=True)
+def report_cube(digest, directory):
+    _, tables = load_report(directory, "ra")
+    cells = tables["cellules"]
+    cells["Date"] = pd.to_datetime(cells["Date"])
+    return RACube.from_cells(cells)
+
+# Historique partagé entre sessions, persisté sur disque
+@st.cache_resource(show_spinner=False)
+def ra_store():
+    return RAStore("ra")
+
+@st.cache_data(show_spinner=True)
+def store_data(version, _store):
+    return _store.data()
+
+sources = ("Fichier", "Historique incrémental") + (("Rapport précalculé",) if REPORTS_DIR else ())
+source = st.sidebar.radio("Source", sources, horizontal=True)
+historique = source == "Historique incrémental"
+rapport = source == "Rapport précalculé"
+moteurs = ("pandas",) if historique or rapport else ("pandas", "Streaming")
+# Rapport précalculé : le cube du rapport est toujours utilisé, aucun autre moteur
+moteurs += ("DuckDB",) if SQL_AVAILABLE and not rapport else ()
+moteur = st.sidebar.radio("Moteur de calcul", moteurs, horizontal=True,
+                          help="Streaming et DuckDB traitent les extractions plus grandes que la mémoire.")
+streaming = moteur == "Streaming"
+server_path = ""
+if historique:
+    # Seule la nouvelle extraction est lue, dédoublonnée contre l'historique et agrégée
+    new_files = st.sidebar.file_uploader("Ajouter une extraction (CSV)", type="csv", accept_multiple_files=True)
+elif rapport:
+    # Agrégats écrits par report.py : aucune lecture de l'extraction
+    report_choice = st.sidebar.selectbox("Rapport", list_reports(REPORTS_DIR, "ra"))
+else:
+    file_path = st.sidebar.file_uploader("Choisir un fichier CSV", type="csv")
+    if moteur != "pandas" and EXTRACTIONS_DIR:
+        choice = st.sidebar.selectbox("Ou extraction sur le serveur", [""] + server_extractions(EXTRACTIONS_DIR))
+        if choice:
+            server_path = os.path.join(EXTRACTIONS_DIR, choice)
+if streaming:
+    dedupe = st.sidebar.radio("Dédoublonnage", ("exact", "bloom"), horizontal=True)
+
+data = None
+series = None
+stream_stats = None
+store = None
+with prof.stage("chargement") as rec:
+    if historique:
+        store = ra_store()
+        if new_files and st.sidebar.button("Ajouter à l'historique"):
+            for new_file in new_files:
+                stats = store.append(new_file.getvalue(), new_file.name)
+                if stats is None:
+                    st.sidebar.info(f"{new_file.name} : déjà intégré.")
+                else:
+                    st.sidebar.write(f"{new_file.name} : {stats['lignes']} transactions ajoutées, {stats['doublons']} doublons ignorés.")
+        with st.sidebar.expander(f"Historique ({len(store.files)} fichiers)"):
+            if store.files:
+                st.dataframe(pd.DataFrame(store.files).drop(columns="digest"), hide_index=True)
+            if st.button("Vider l'historique"):
+                store.clear()
+                st.rerun()
+        if store.cube is None:
+            st.sidebar.write("Historique vide : ajoutez une première extraction.")
+            st.stop()
+        digest = store.version
+        data = store_data(digest, store)
+    elif rapport:
+        manifest_path = os.path.join(REPORTS_DIR, report_choice or "", "manifest.json")
+        if not report_choice or not within_root(REPORTS_DIR, manifest_path):
+            st.sidebar.write("Aucun rapport RA disponible : générez-en un avec report.py.")
+            st.stop()
+        digest = file_digest(manifest_path)
+        try:
+            cube = report_cube(digest, os.path.dirname(os.path.realpath(manifest_path)))
+        except (KeyError, OSError) as e:
+            st.sidebar.error(f"Rapport illisible ou antérieur aux agrégats du cube (à régénérer) : {e}")
+            st.stop()
+    elif server_path:
+        if not within_root(EXTRACTIONS_DIR, server_path):
+            st.sidebar.error("Extraction introuvable dans le répertoire autorisé.")
+            st.stop()
+        server_path = os.path.realpath(server_path)
+        try:
+            digest = file_digest(server_path)
+            if streaming:
+                cube, stream_stats = stream_ra(digest, server_path, dedupe)
+            else:
+                # DuckDB lit et dédoublonne le CSV lui-même, hors mémoire
+                cube = ra_sql(digest, _path=server_path)
+        except Exception as e:
+            st.sidebar.error(f"Lecture de l'extraction impossible : {e}")
+            st.stop()
+    elif file_path is not None:
+        raw_bytes = file_path.getvalue()
+        digest = content_digest(raw_bytes)
+        if streaming:
+            cube, stream_stats = stream_ra(digest, io.BytesIO(raw_bytes), dedupe)
+        else:
+            # Lecture, cube et vue globale démarrent en arrière-plan
+            job = job_runner().submit(f"ra-{digest}", precompute_steps(digest, raw_bytes), job_owner)
+            slot = st.sidebar.empty()
+            data = job.wait("donnees", on_wait=lambda j: show_progress(j, slot))
+            slot.empty()
+    else:
+        job_runner().release(job_owner)
+        st.sidebar.write("Veuillez charger un fichier CSV.")
+        st.stop()
+    if data is not None:
+        rec["lignes_sortie"] = len(data)
+prof.meta["dataset"] = digest
+if job is None:
+    job_runner().release(job_owner)
+
+if data is not None:
+    # Cube pré-agrégé, construit une seule fois par fichier
+    @st.cache_data(show_spinner=False)
+    def build_ra_cube(digest, _data):
+        return RACube(_data)
+
+    # En mode historique, le cube est tenu à jour à chaque ajout
+    with prof.stage("cube", len(data)):
+        if store is not None:
+            cube = store.cube
+        elif job is not None:
+            cube = job.wait("cube")
+        else:
+            cube = build_ra_cube(digest, data)
+
+    # Séries temporelles construites une fois à partir de created_at (voir timeseries.py)
+    @st.cache_data(show_spinner=False)
+    def build_ra_series(digest, _data):
+        return RASeries(_data)
+
+    with prof.stage("séries temporelles", len(data)):
+        series = job.wait("séries temporelles") if job is not None else build_ra_series(digest, data)
+
+    # Rapport mémoire calculé une fois par fichier
+    @st.cache_data(show_spinner=False)
+    def dataset_memory(digest, _data):
+        return memory_report(_data)
+
+    with st.sidebar.expander("Mémoire du dataset"):
+        st.dataframe(dataset_memory(digest, data), hide_index=True)
+
+    if moteur == "DuckDB":
+        reference, cube = cube, ra_sql(digest, _data=data)
+        if st.sidebar.checkbox("Comparer avec pandas"):
+            ecarts = compare_kpis(reference.kpis(), cube.kpis())
+            if ecarts:
+                st.sidebar.warning(f"Écarts DuckDB / pandas : {', '.join(ecarts)}")
+            else:
+                st.sidebar.success("DuckDB et pandas concordent.")
+elif stream_stats is not None:
+    with st.sidebar.expander("Lecture en streaming"):
+        st.json(stream_stats)
+    if stream_stats.get("bloom_sature"):
+        st.sidebar.warning("Filtre de Bloom saturé : des transactions distinctes ont pu être écartées comme doublons. "
+                           "Utilisez le dédoublonnage exact.")
 
 # --- Filtres dans la barre latérale ---
 st.sidebar.header("🔎 Filtres Stratégiques")
-dated = st.sidebar.multiselect('Date', options=sorted(data['Date'].unique()))
-statuts = st.sidebar.multiselect('Statut', options=sorted(data['statut'].unique()))
-operation = st.sidebar.multiselect('Operation', options=sorted(data['operation_origin'].unique()))
-pays = st.sidebar.multiselect('Pays', options=sorted(data['country'].unique()))
-partenaire = st.sidebar.multiselect('Provider Name', options=sorted(data['provider_name'].unique()))
+dated = st.sidebar.multiselect('Date', options=cube.options('Date'), format_func=lambda d: d.strftime('%Y-%m-%d'))
+statuts = st.sidebar.multiselect('Statut', options=cube.options('statut'))
+operation = st.sidebar.multiselect('Operation', options=cube.options('operation_origin'))
+pays = st.sidebar.multiselect('Pays', options=cube.options('country'))
+partenaire = st.sidebar.multiselect('Provider Name', options=cube.options('provider_name'))
 
+filters = {}
 if dated:
-    data = data[data['Date'].isin(dated)]
-    data = data[data['statut'].isin(statuts)]
-    data = data[data['operation_origin'].isin(operation)]
-    data = data[data['country'].isin(pays)]
-    data = data[data['provider_name'].isin(partenaire)]
-    
-# --- Création des onglets ---
-tabs = st.tabs(["📊 Vue Globale", "👥 Opérations", "🔄 Transactions"])
+    filters = {"Date": dated, "statut": statuts, "operation_origin": operation, "country": pays, "provider_name": partenaire}
+    if data is not None:
+        with prof.stage("filtres", len(data)) as rec:
+            data = data[data['Date'].isin(dated)]
+            data = data[data['statut'].isin(statuts)]
+            data = data[data['operation_origin'].isin(operation)]
+            data = data[data['country'].isin(pays)]
+            data = data[data['provider_name'].isin(partenaire)]
+            rec["lignes_sortie"] = len(data)
+scope = (digest, moteur, dedupe if streaming else None, tuple((k, tuple(v)) for k, v in filters.items()))
+prof.meta["moteur"] = moteur
+if job is not None and scope == default_scope(digest):
+    try:
+        job.wait("vue globale")
+    except Exception:
+        pass  # étape en échec ou annulée : calcul direct
+with prof.stage("KPI et agrégats"):
+    kpis, provider_amounts, statut_amounts, country_amounts = ra_overview(scope, cube, filters)
 
-# Onglet Vision 360 (contenu à enrichir ultérieurement)
-if len(tabs) > 2:
-    with tabs[2]:
-        st.subheader("Transactions")
-        st.write("Contenu de l'onglet Vision 360 à définir.")
-else:
-    st.error("L'onglet 'Vision 360' n'a pas été créé correctement.")
+# --- Création des onglets ---
+# Onglets paresseux : rapprochement et anomalies ne sont calculés que si leur onglet est ouvert
+tabs = st.tabs(["📊 Vue Globale", "👥 Opérations", "🔄 Transactions"], key="onglet", on_change="rerun")
+
+# Onglet Transactions : rapprochement payin/payout ou avec une extraction provider, détection d'anomalies
+with tabs[2]:
+    st.subheader("Transactions")
+    if tabs[2].open:
+        if data is None:
+            st.info("Le rapprochement et la détection d'anomalies portent sur les transactions détaillées : chargez le fichier avec le moteur pandas ou DuckDB.")
+        else:
+            analyse = st.radio("Analyse", ("Rapprochement", "Anomalies"), horizontal=True)
+            if analyse == "Anomalies":
+                col1, col2, col3, col4 = st.columns(4)
+                threshold = col1.number_input("Seuil (écarts types)", min_value=2.0, value=4.0, step=0.5)
+                window = col2.selectbox("Tranche de temps (minutes)", (5, 15, 30, 60), index=1)
+                burst = col3.number_input("Fenêtre des rafales (secondes)", min_value=10, value=60, step=10)
+                source = col4.selectbox("Source des rafales", [c for c in ("merchant_name", "operator", "provider_name") if c in data.columns])
+                with prof.stage("anomalies", len(data)) as rec:
+                    flagged, windows = ra_anomalies(scope, data, threshold, window, burst, source)
+                    rec["lignes_sortie"] = len(flagged)
+                alerts = windows[windows["anomalie"].notna()]
+                col1, col2, col3 = st.columns(3)
+                col1.markdown(metric_card("Transactions signalées", flagged["transaction_id"].nunique(), "#B22222"), unsafe_allow_html=True)
+                col2.markdown(metric_card("Pics d'échecs", int((alerts["anomalie"] == FAILURES).sum()), "#FF8C00"), unsafe_allow_html=True)
+                col3.markdown(metric_card("Pics de volume", int((alerts["anomalie"] == VOLUME).sum()), "#4682B4"), unsafe_allow_html=True)
+
+                st.markdown("#### Taux d'échec par tranche")
+                fig = px.line(windows, x="fenetre", y="taux_echec", color="provider_name", template="plotly_white")
+                fig.add_scatter(x=alerts["fenetre"], y=alerts["taux_echec"], mode="markers", name="Tranche signalée",
+                                marker=dict(color="#B22222", size=10, symbol="x"), text=alerts["anomalie"])
+                fig.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
+                plotly_chart(fig, "taux d'échec par tranche", use_container_width=True, config={"displayModeBar": False})
+
+                st.markdown("#### Tranches signalées")
+                st.dataframe(alerts, hide_index=True)
+                st.markdown("#### Transactions signalées")
+                shown = st.multiselect("Motif", (AMOUNT, BURST), default=(AMOUNT, BURST))
+                rows = flagged[flagged["anomalie"].isin(shown)]
+                st.dataframe(rows.head(10_000), hide_index=True)
+                st.download_button("Exporter en CSV", rows.to_csv(index=False), "anomalies.csv", "text/csv")
+            else:
+                mode = st.radio("Rapprocher", ("Payin / Payout", "Extraction provider"), horizontal=True)
+                # L'extraction est dédoublonnée sur transaction_id : payin et payout n'en partagent aucun
+                keys = [k for k in KEYS if k in data.columns and (mode != "Payin / Payout" or k != "transaction_id")]
+                col1, col2, col3 = st.columns(3)
+                key = col1.selectbox("Identifiant", keys)
+                amount_tol = col2.number_input("Tolérance sur le montant (XOF)", min_value=0.0, value=0.0, step=50.0)
+                window = col3.number_input("Fenêtre de temps (minutes)", min_value=0, value=0,
+                                           help="0 : désactivée. Sinon, lignes sans identifiant commun : même montant, "
+                                                "même provider et même marchand à cette distance près.")
+                right = None
+                if key is None:
+                    st.info("Aucun identifiant commun (external_transaction_id, merchant_transaction_id) dans l'extraction.")
+                elif mode == "Payin / Payout":
+                    # Mêmes filtres que la vue globale
+                    left, right = split_payin_payout(data)
+                    counterpart = "payout"
+                else:
+                    other = st.file_uploader("Extraction de contrepartie (CSV)", type="csv", key="contrepartie")
+                    if other is None:
+                        st.write("Chargez l'extraction du provider à rapprocher de la référence.")
+                    else:
+                        other_raw = other.getvalue()
+                        counterpart = content_digest(other_raw)
+                        left, right = data, load_ra(counterpart, other_raw)
+                if right is not None:
+                    with prof.stage("rapprochement", len(left) + len(right)) as rec:
+                        summary, to_review = ra_reconciliation(scope + (counterpart,), left, right, key, amount_tol, window)
+                        rec["lignes_sortie"] = len(to_review)
+                    if window:
+                        st.caption("Les rapprochements « rapprochée (fenêtre) » reposent sur le montant, le provider et "
+                                   "l'horodatage seulement : à vérifier avant de les considérer comme acquis.")
+                    matched = summary[[STATUSES[0], STATUSES[1]]].to_numpy().sum()
+                    total = summary[STATUSES].to_numpy().sum()
+                    col1, col2, col3 = st.columns(3)
+                    col1.markdown(metric_card("Taux de rapprochement", f"{100 * matched / max(total, 1):.2f} %", "#2E8B57"), unsafe_allow_html=True)
+                    col2.markdown(metric_card("Transactions à traiter", len(to_review), "#FF8C00"), unsafe_allow_html=True)
+                    col3.markdown(metric_card("Écart de montant", f"{summary['ecart_montant'].sum():,.2f} XOF", "#B22222"), unsafe_allow_html=True)
+
+                    st.markdown("#### Rapprochement par provider")
+                    st.dataframe(summary, hide_index=True)
+                    counts = summary.melt(id_vars="provider_name", value_vars=STATUSES, var_name="Statut", value_name="Transactions")
+                    fig = px.bar(counts, x="provider_name", y="Transactions", color="Statut", barmode="stack", template="plotly_white")
+                    fig.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
+                    plotly_chart(fig, "rapprochement par provider", use_container_width=True, config={"displayModeBar": False})
+
+                    st.markdown("#### Transactions à traiter")
+                    shown = st.multiselect("Statut", STATUSES[2:], default=STATUSES[2:])
+                    rows = to_review[to_review["statut_rapprochement"].isin(shown)]
+                    st.dataframe(rows.head(10_000), hide_index=True)
+                    st.download_button("Exporter en CSV", rows.to_csv(index=False), "rapprochement.csv", "text/csv")
 
 # =========================
     # Onglet 1 : Vue Globale
@@ -124,74 +486,65 @@ else:
 
 with tabs[0]:
     st.subheader("Vue Globale")
-        # Calcul des KPI
-    montant_total = data["amount"].sum()
-    nombre_transaction=data['transaction_id'].count()
-    nombre_payin=payin['transaction_id'].count()
-    Nombre_payout=payout['transaction_id'].count()
-    montant_total_payin = payin["amount"].sum()
-    montant_total_payout = payout["amount"].sum()
 
 # Affichage dans des metric cards
 col1, col2= st.columns(2)
-col1.markdown(metric_card("Nombre Total Transaction", nombre_transaction, "#1E90FF"), unsafe_allow_html=True)
-col2.markdown(metric_card("Montant Total", f"{montant_total:,.2f} XOF", "#2E8B57"), unsafe_allow_html=True)
+col1.markdown(metric_card("Nombre Total Transaction", kpis["nombre_transaction"], "#1E90FF"), unsafe_allow_html=True)
+col2.markdown(metric_card("Montant Total", f"{kpis['montant_total']:,.2f} XOF", "#2E8B57"), unsafe_allow_html=True)
 
 #affichage des graphes
 st.markdown("---")
 st.markdown("#### Evololutions des transactions par Opérateur")
-monthly_sales = data.groupby("provider_name")["amount"].sum().reset_index()
-fig_month = px.bar(monthly_sales, x="provider_name", y="amount",
+fig_month = px.bar(provider_amounts, x="provider_name", y="amount",
     text_auto=True,
     color="amount",
     color_continuous_scale=["#1E90FF", "#4682B4"],
     template="plotly_white")
 fig_month.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
-st.plotly_chart(fig_month, use_container_width=True, config={"displayModeBar": False})
+plotly_chart(fig_month, "montant par provider", use_container_width=True, config={"displayModeBar": False})
 
 chart1, chart2= st.columns((2))
 with chart1:
     st.subheader('Vue globale par Statut')
-    fig=px.pie(data, values="amount",names="statut", template="plotly_dark")
-    fig.update_traces(text=data["statut"], textposition="inside")
-    st.plotly_chart(fig,use_container_width=True)
+    # Camembert servi par le cube, agrégé par statut : une part par statut, pas par transaction
+    fig = pie(statut_amounts, names="statut", values="amount", template="plotly_dark")
+    plotly_chart(fig, "montant par statut", use_container_width=True)
 
 with chart2:
     st.subheader('Vue globale par Pays')
-    monthly_statut = data.groupby("country")["amount"].sum().reset_index()
-    fig_month = px.bar(monthly_statut, x="country", y="amount",
+    fig_month = px.bar(country_amounts, x="country", y="amount",
         text_auto=True,
         color="amount",
         color_continuous_scale=["#1E90FF", "#4682B4"],
         template="plotly_white")
     fig_month.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
-    st.plotly_chart(fig_month, use_container_width=True, config={"displayModeBar": False})
-   
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    plotly_chart(fig_month, "montant par pays", use_container_width=True, config={"displayModeBar": False})
 
+st.markdown("---")
+st.markdown("#### Évolution dans le temps")
+if series is None:
+    st.info("L'évolution s'appuie sur les horodatages des transactions : chargez le fichier avec le moteur pandas ou DuckDB.")
+else:
+    col1, col2, col3 = st.columns(3)
+    granularite = col1.radio("Granularité", list(GRANULARITIES), index=0, horizontal=True)
+    mesure = col2.radio("Mesure", ("amount", "transactions"), horizontal=True,
+                        format_func=lambda m: {"amount": "Montant", "transactions": "Nombre"}[m])
+    axe = col3.radio("Par", ("statut", "provider_name"), horizontal=True)
+    with prof.stage("évolution"):
+        trend = ra_trend(scope, granularite, mesure, axe, series, filters)
+    fig = px.line(trend, x=granularite, y=mesure, color=axe, markers=True, template="plotly_white")
+    fig.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
+    plotly_chart(fig, "évolution", use_container_width=True, config={"displayModeBar": False})
+    with st.expander("Croissance, moyenne mobile et cycle précédent"):
+        st.dataframe(trend, hide_index=True)
+   
 
+# Compteurs relevés en fin d'exécution
+with st.sidebar.expander("Cache partagé"):
+    st.json(results.stats())
 
+if prof.enabled:
+    with st.sidebar.expander("Performance", expanded=True):
+        st.dataframe(prof.frame(), hide_index=True)
+        st.download_button("Exporter en JSON", prof.to_json(), "performance.json", "application/json")
+        st.download_button("Exporter en CSV", prof.to_csv(), "performance.csv", "text/csv")
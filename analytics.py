@@ -0,0 +1,197 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+
+from features import CustomerFeatures
+
+# Calculs des deux dashboards, sans aucun appel Streamlit : chaque fonction prend un
+# DataFrame et renvoie des résultats, ce qui permet de les chronométrer (voir benchmarks/).
+
+SEGMENT_FEATURES = ["Sales", "NbCmd", "Quantity Ordered"]
+DAY_NAMES = {0: "Lundi", 1: "Mardi", 2: "Mercredi", 3: "Jeudi", 4: "Vendredi", 5: "Samedi", 6: "Dimanche"}
+EXPENSE_RATE = 0.2  # hypothèse de 20%
+NET_RATE = 0.8
+
+
+# --- Dashboard Ventes ---
+def sales_kpis(data):
+    return {
+        "total_sales": data["Sales"].sum(),
+        "total_orders": data["Order ID"].nunique(),
+        "total_customers": data["Purchase Address"].nunique(),
+    }
+
+
+def monthly_sales(data):
+    return data.groupby("Month")["Sales"].sum().reset_index()
+
+
+def product_sales(data):
+    return data.groupby("Product", observed=True)["Quantity Ordered"].sum().reset_index()
+
+
+def _order_product_matrix(data):
+    # Matrice d'incidence creuse commandes x produits (1 si le produit figure dans la commande).
+    # Les codes produits suivent l'ordre alphabétique : (i < j) donne des combinaisons triées.
+    orders, order_ids = pd.factorize(data["Order ID"])
+    products, names = pd.factorize(data["Product"], sort=True)
+    ones = np.ones(len(orders), dtype=np.int32)
+    matrix = sparse.csr_matrix((ones, (orders, products)), shape=(len(order_ids), len(names)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix, np.asarray(names, dtype=object)
+
+
+def _pair_counts(matrix):
+    # A^T A : le terme (i, j) est le nombre de commandes contenant à la fois i et j
+    co = sparse.triu(matrix.T @ matrix, k=1).tocoo()
+    return np.column_stack([co.row, co.col]), co.data
+
+
+def _itemset_counts(matrix, size):
+    # Seules les commandes d'au moins `size` produits distincts peuvent contenir une combinaison
+    basket_sizes = np.diff(matrix.indptr)
+    sub = matrix[basket_sizes >= size]
+    if sub.shape[0] == 0:
+        return np.empty((0, size), dtype=np.int64), np.empty(0, dtype=np.int64)
+    sizes = np.diff(sub.indptr)
+    # Paniers rangés dans une matrice complétée par -1, les produits triés à gauche
+    padded = np.full((sub.shape[0], sizes.max()), -1, dtype=np.int64)
+    rows = np.repeat(np.arange(sub.shape[0]), sizes)
+    cols = np.arange(len(sub.indices)) - np.repeat(sub.indptr[:-1], sizes)
+    padded[rows, cols] = sub.indices
+    # Boucle sur les positions dans le panier uniquement, jamais sur les commandes
+    combos = []
+    for positions in combinations(range(padded.shape[1]), size):
+        block = padded[:, positions]
+        combos.append(block[block[:, -1] >= 0])
+    return np.unique(np.concatenate(combos), axis=0, return_counts=True)
+
+
+def top_product_combinations(data, size=2, top_n=5):
+    """Combinaisons de `size` produits les plus fréquentes dans une même commande."""
+    if data.empty:
+        return []
+    matrix, names = _order_product_matrix(data)
+    if size == 2:
+        itemsets, counts = _pair_counts(matrix)
+    else:
+        itemsets, counts = _itemset_counts(matrix, size)
+    # Tri par fréquence décroissante puis par noms pour un résultat stable
+    order = np.lexsort(tuple(itemsets[:, i] for i in reversed(range(size))) + (-counts,))[:top_n]
+    return [(tuple(names[itemsets[i]]), int(counts[i])) for i in order]
+
+
+# --- Segmentation Clients ---
+def customer_table(data):
+    # Groupement vectorisé sur les codes d'adresse (voir features.py) ; colonnes historiques
+    # Sales, NbCmd, Quantity Ordered puis variables RFM
+    return CustomerFeatures(data).table()
+
+
+def scale_features(cust, features=SEGMENT_FEATURES):
+    return StandardScaler().fit_transform(cust[features])
+
+
+def segment_summary(cust):
+    seg_count = cust["Cluster"].value_counts().reset_index()
+    seg_count.columns = ["Cluster", "Clients"]
+    seg_sales = cust.groupby("Cluster")["Sales"].sum().reset_index()
+    seg_sales["Prop (%)"] = 100 * seg_sales["Sales"] / seg_sales["Sales"].sum()
+    return seg_count, seg_sales
+
+
+def _row_customers(data, cust):
+    # Position du client de chaque ligne dans `cust` : une recherche par adresse distincte,
+    # reportée sur les lignes par leur code, sans fusion ni copie du dataset
+    addresses = data["Purchase Address"]
+    if isinstance(addresses.dtype, pd.CategoricalDtype):
+        codes, uniques = addresses.cat.codes.to_numpy(), addresses.cat.categories
+    else:
+        codes, uniques = pd.factorize(addresses)
+    by_code = pd.Index(cust["Purchase Address"].astype(str)).get_indexer(pd.Index(uniques).astype(str))
+    return np.where(codes >= 0, by_code[codes], -1)
+
+
+def segment_top_products(data, cust, top_n=5):
+    # Une seule passe groupée segment x produit, quel que soit le nombre de segments
+    rows = _row_customers(data, cust)
+    labels, clusters = pd.factorize(cust["Cluster"], sort=True)
+    segments = np.where(rows >= 0, labels[rows], -1)
+    products, names = pd.factorize(data["Product"], sort=True)
+    keep = (segments >= 0) & (products >= 0)
+    quantity = data["Quantity Ordered"].to_numpy(dtype=np.float64)
+    totals = sparse.coo_matrix(
+        (quantity[keep], (segments[keep], products[keep])), shape=(len(clusters), len(names))
+    ).toarray()
+    if pd.api.types.is_integer_dtype(data["Quantity Ordered"]):
+        totals = totals.round().astype(np.int64)
+    names = np.asarray(names, dtype=object)
+    tops = {}
+    for i, c in enumerate(clusters):
+        order = np.argsort(-totals[i], kind="stable")[:top_n]
+        order = order[totals[i, order] > 0]
+        tops[c] = pd.DataFrame({"Product": names[order], "Quantity Ordered": totals[i, order]})
+    return tops
+
+
+def pca_projection(X):
+    return PCA(n_components=2).fit_transform(X)
+
+
+# --- Vision 360 ---
+def financial_kpis(revenue, expense_rate=EXPENSE_RATE, net_rate=NET_RATE):
+    expenses = revenue * expense_rate
+    gross_profit = revenue - expenses
+    return {
+        "revenue": revenue,
+        "expenses": expenses,
+        "gross_profit": gross_profit,
+        "net_profit": gross_profit * net_rate,
+    }
+
+
+def monthly_financials(monthly, expense_rate=EXPENSE_RATE):
+    # `monthly` : CA par mois (colonnes Month, Sales), issu de monthly_sales ou d'un cube
+    monthly_df = monthly.rename(columns={"Sales": "Revenue"})
+    monthly_df["Expenses"] = monthly_df["Revenue"] * expense_rate
+    monthly_df["Net_Profit"] = monthly_df["Revenue"] - monthly_df["Expenses"]
+    monthly_df["Growth"] = monthly_df["Revenue"].pct_change().fillna(0) * 100
+    return monthly_df
+
+
+def name_weekdays(day_sales):
+    day_sales["Jour"] = day_sales["Weekday"].map(DAY_NAMES)
+    return day_sales
+
+
+def weekday_sales(data):
+    # Groupement direct sur le jour de la semaine, sans copier le dataset
+    weekday = data["Order Date"].dt.dayofweek.rename("Weekday")
+    return name_weekdays(data["Sales"].groupby(weekday).sum().reset_index())
+
+
+# --- Reporting RA ---
+def split_payin_payout(data):
+    payin = data[data["operation_origin"] == "payment"]
+    payout = data[data["operation_origin"] == "transfer"]
+    return payin, payout
+
+
+def ra_kpis(data, payin, payout):
+    return {
+        "montant_total": data["amount"].sum(),
+        "nombre_transaction": data["transaction_id"].count(),
+        "nombre_payin": payin["transaction_id"].count(),
+        "nombre_payout": payout["transaction_id"].count(),
+        "montant_total_payin": payin["amount"].sum(),
+        "montant_total_payout": payout["amount"].sum(),
+    }
+
+
+def amount_by(data, column):
+    return data.groupby(column, observed=True)["amount"].sum().reset_index()
@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+
+from ingestion import RA_CHUNKSIZE
+
+# --- Détection d'anomalies sur les transactions RA ---
+# Une seule passe sur les transactions triées par created_at, bloc par bloc : l'état des
+# statistiques en ligne (moyenne et variance EWMA par groupe, queue de la fenêtre glissante,
+# compteurs par tranche de temps) est conservé d'un bloc au suivant.
+# Chaque valeur est comparée aux statistiques de son groupe *avant* elle (z-score EWMA) :
+# - montant inhabituel par provider × pays (échelle logarithmique, distribution très asymétrique) ;
+# - rafale : transactions d'une même source (marchand) dans une fenêtre glissante ;
+# - tranches de temps d'un provider au taux d'échec ou au volume anormal.
+
+AMOUNT, BURST = "montant inhabituel", "rafale"
+FAILURES, VOLUME = "pic d'échecs", "pic de volume"
+# Statuts qui ne sont pas des échecs (transactions abouties ou en cours)
+NOT_FAILED = ("SUCCESS", "PENDING", "INITIATED")
+ROW_COLUMNS = ["created_at", "transaction_id", "provider_name", "country", "merchant_name", "statut", "amount"]
+
+
+class EwmState:
+    """Moyenne et carré moyen EWMA par groupe, repris d'un bloc à l'autre."""
+
+    def __init__(self, alpha, min_std=0.0):
+        self.alpha = alpha
+        self.min_std = min_std
+        self.keys = None
+        self.mean, self.sq = np.empty(0), np.empty(0)
+        self.n = np.empty(0, dtype=np.int64)
+
+    def codes(self, *columns):
+        """Identifiant stable de groupe pour chaque ligne ; les nouveaux groupes sont ajoutés."""
+        # Codes de chaque colonne combinés en un entier : seuls les groupes distincts sont matérialisés
+        combined, levels = np.zeros(len(columns[0]), dtype=np.int64), []
+        for col in columns:
+            codes, uniques = pd.factorize(col, use_na_sentinel=False)
+            combined = combined * len(uniques) + codes
+            levels.append(uniques)
+        local, seen = pd.factorize(combined)
+        parts = []
+        for uniques in reversed(levels):
+            seen, pos = np.divmod(seen, len(uniques))
+            parts.append(np.asarray(uniques, dtype=object)[pos])
+        keys = pd.MultiIndex.from_arrays(parts[::-1])
+        if self.keys is None:
+            self.keys = keys[:0]
+        new = keys[self.keys.get_indexer(keys) < 0]
+        if len(new):
+            self.keys = self.keys.append(new)
+            self.mean = np.concatenate([self.mean, np.zeros(len(new))])
+            self.sq = np.concatenate([self.sq, np.zeros(len(new))])
+            self.n = np.concatenate([self.n, np.zeros(len(new), dtype=np.int64)])
+        return self.keys.get_indexer(keys)[local]
+
+    def score(self, values, groups):
+        """(z-score, moyenne attendue, effectif) de chaque valeur face à son groupe avant elle."""
+        if not len(values):
+            return np.empty((3, 0))
+        order = np.argsort(groups, kind="stable")
+        g, x = groups[order], values[order]
+        starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+        ids = g[starts]
+        seeded = self.n[ids] > 0
+        # L'état de chaque groupe est inséré comme pseudo-observation avant ses lignes :
+        # la récurrence EWMA (adjust=False) reprend exactement où le bloc précédent s'est arrêté
+        at = starts[seeded]
+        gx = np.insert(g, at, ids[seeded])
+        frame = pd.DataFrame({
+            "x": np.insert(x, at, self.mean[ids[seeded]]),
+            "x2": np.insert(x * x, at, self.sq[ids[seeded]]),
+        })
+        ewm = frame.groupby(gx, sort=False).ewm(alpha=self.alpha, adjust=False).mean().to_numpy()
+        real = np.ones(len(gx), dtype=bool)
+        real[at + np.arange(len(at))] = False
+
+        # Statistiques avant chaque ligne : valeur EWMA de la position précédente du même groupe
+        same = np.r_[False, gx[1:] == gx[:-1]]
+        prior = np.where(same[:, None], np.vstack([np.full((1, 2), np.nan), ewm[:-1]]), np.nan)[real]
+        mean, var = prior[:, 0], np.maximum(prior[:, 1] - prior[:, 0] ** 2, 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (x - mean) / np.sqrt(var + self.min_std ** 2)
+        sizes = np.diff(np.r_[starts, len(g)])
+        count = self.n[g] + np.arange(len(g)) - np.repeat(starts, sizes)
+
+        last = np.r_[gx[1:] != gx[:-1], True]
+        self.mean[ids], self.sq[ids] = ewm[last, 0], ewm[last, 1]
+        self.n[ids] += sizes
+
+        out = np.empty((3, len(g)))
+        out[:, order] = z, mean, count
+        return out
+
+
+class AnomalyDetector:
+    """Détecteur en une passe : `update` sur chaque bloc (ordre de created_at), puis `windows`."""
+
+    def __init__(self, alpha=0.05, threshold=4.0, warmup=30, window="15min",
+                 window_warmup=8, burst_window="60s", burst_alpha=0.01, source="merchant_name", min_burst=5):
+        self.threshold = threshold
+        self.warmup = warmup
+        self.window = window
+        self.window_warmup = window_warmup
+        self.burst_seconds = int(pd.Timedelta(burst_window).total_seconds())
+        self.source = source
+        self.min_burst = min_burst
+        self.alpha = alpha
+        # Écart type plancher : une série constante ne signale pas le moindre écart
+        self.amounts = EwmState(alpha, min_std=0.1)
+        # Référence lente pour les rafales : les lignes d'une rafale ne la rattrapent pas aussitôt
+        self.bursts = EwmState(burst_alpha)
+        self._tail_t = np.empty(0, dtype=np.int64)
+        self._tail_s = np.empty(0, dtype=np.int64)
+        self._last = None
+        self._windows = []
+
+    def update(self, chunk):
+        """Lignes anormales du bloc, une par (transaction, motif), avec score et valeur attendue."""
+        chunk = chunk[chunk["created_at"].notna()]
+        if not chunk["created_at"].is_monotonic_increasing:
+            chunk = chunk.sort_values("created_at", kind="stable")
+        created = chunk["created_at"]
+        if len(chunk) and self._last is not None and created.iloc[0] < self._last:
+            raise ValueError("Les blocs doivent être fournis dans l'ordre de created_at.")
+        if len(chunk):
+            self._last = created.iloc[-1]
+        flagged = []
+
+        # Montant inhabituel par provider × pays
+        amount = chunk["amount"].to_numpy(np.float64)
+        valid = ~np.isnan(amount)
+        groups = self.amounts.codes(chunk["provider_name"][valid], chunk["country"][valid])
+        z, mean, count = self.amounts.score(np.log1p(np.abs(amount[valid])), groups)
+        hit = (count >= self.warmup) & (np.abs(z) > self.threshold)
+        rows = np.flatnonzero(valid)[hit]
+        flagged.append(self._rows(chunk, rows, AMOUNT, z[hit], np.expm1(mean[hit])))
+
+        # Rafales : transactions de la même source dans la fenêtre glissante
+        if self.source in chunk.columns:
+            sources = self.bursts.codes(chunk[self.source])
+            counts = self._burst_counts(created.to_numpy("datetime64[s]").astype(np.int64), sources)
+            _, mean, count = self.bursts.score(counts, sources)
+            # Écart à la moyenne en unités d'écart type de Poisson
+            z = (counts - mean) / np.sqrt(np.maximum(mean, 1))
+            hit = (count >= self.warmup) & (z > self.threshold) & (counts >= self.min_burst)
+            rows = np.flatnonzero(hit)
+            flagged.append(self._rows(chunk, rows, BURST, z[hit], mean[hit], counts[hit]))
+
+        # Compteurs par provider et tranche de temps (additifs : une tranche peut chevaucher deux blocs)
+        failed = ~chunk["statut"].isin(NOT_FAILED).to_numpy()
+        self._windows.append(pd.DataFrame({
+            "provider_name": chunk["provider_name"].to_numpy(),
+            "fenetre": created.dt.floor(self.window).to_numpy(),
+            "transactions": 1,
+            "echecs": failed.astype(np.int64),
+        }).groupby(["provider_name", "fenetre"], observed=True, sort=False).sum().reset_index())
+        return pd.concat(flagged, ignore_index=True)
+
+    def _burst_counts(self, t, sources):
+        # Transactions de la même source dans ]t - fenêtre, t] ; la queue du bloc précédent est reprise
+        n_tail = len(self._tail_t)
+        tt = np.concatenate([self._tail_t, t])
+        ss = np.concatenate([self._tail_s, sources])
+        if not len(tt):
+            return np.empty(0)
+        order = np.lexsort((tt, ss))
+        # Clé composite (source, instant) : une recherche dichotomique par ligne
+        t0 = tt.min()
+        span = tt.max() - t0 + self.burst_seconds + 1
+        key = ss[order] * span + (tt[order] - t0)
+        counts = np.empty(len(tt))
+        counts[order] = np.arange(len(key)) - np.searchsorted(key, key - self.burst_seconds, side="right") + 1
+        recent = tt > tt.max() - self.burst_seconds
+        self._tail_t, self._tail_s = tt[recent], ss[recent]
+        return counts[n_tail:]
+
+    def _rows(self, chunk, rows, reason, score, expected, counts=None):
+        out = chunk.iloc[rows][[c for c in ROW_COLUMNS if c in chunk.columns]].reset_index(drop=True)
+        out["anomalie"] = reason
+        out["score"] = score
+        out["attendu"] = expected
+        if counts is not None:
+            out["transactions_fenetre"] = counts
+        return out
+
+    def windows(self):
+        """Toutes les tranches (provider, fenêtre) avec scores d'échecs et de volume ; `anomalie` si signalée."""
+        cols = ["provider_name", "fenetre", "transactions", "echecs"]
+        if not self._windows:
+            return pd.DataFrame(columns=cols + ["taux_echec", "z_echecs", "z_volume", "anomalie"])
+        win = pd.concat(self._windows, ignore_index=True)
+        win = win.groupby(["provider_name", "fenetre"], observed=True).sum().reset_index()
+        win = win.sort_values(["fenetre", "provider_name"], ignore_index=True)
+        win["taux_echec"] = win["echecs"] / win["transactions"]
+        provider = win["provider_name"]
+        # Peu de tranches : état neuf, une seule passe dans l'ordre du temps
+        rate, volume = EwmState(self.alpha), EwmState(self.alpha, min_std=1.0)
+        _, p, count = rate.score(win["taux_echec"].to_numpy(), rate.codes(provider))
+        # Échecs de la tranche face au taux habituel du provider (écart type binomial)
+        n = win["transactions"].to_numpy()
+        z_rate = (win["echecs"].to_numpy() - n * p) / np.sqrt(n * p * (1 - p) + 1)
+        z_volume, _, _ = volume.score(win["transactions"].to_numpy(np.float64), volume.codes(provider))
+        win["z_echecs"], win["z_volume"] = z_rate, z_volume
+        warm = count >= self.window_warmup
+        spikes = warm & (z_rate > self.threshold) & (win["echecs"].to_numpy() >= 3)
+        surges = warm & (z_volume > self.threshold)
+        win["anomalie"] = np.where(spikes, FAILURES, np.where(surges, VOLUME, None))
+        return win
+
+
+def detect_anomalies(data, chunksize=RA_CHUNKSIZE, **params):
+    """Lignes et tranches anormales d'une extraction, traitée par blocs dans l'ordre de created_at."""
+    detector = AnomalyDetector(**params)
+    if not data["created_at"].is_monotonic_increasing:
+        data = data.sort_values("created_at", kind="stable")
+    rows = [detector.update(data.iloc[start:start + chunksize]) for start in range(0, max(len(data), 1), chunksize)]
+    return pd.concat(rows, ignore_index=True), detector.windows()
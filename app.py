@@ -1,17 +1,25 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.express as px
-from plotly.subplots import make_subplots
-from itertools import combinations
-from collections import Counter
-import zipfile
-import io
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.metrics import silhouette_score
+import os
+import uuid
 from streamlit_extras.stylable_container import stylable_container
+from ingestion import load_sales_zip, clean_sales, compact_frame, memory_report, InvertedIndex, SALES_CATEGORIES
+from cache import FrameCache, ResultCache, content_digest, file_digest
+from analytics import (
+    SEGMENT_FEATURES, top_product_combinations, customer_table, scale_features, segment_summary,
+    segment_top_products, pca_projection, financial_kpis, monthly_financials, name_weekdays,
+)
+from cube import SalesCube
+from timeseries import GRANULARITIES, SalesSeries
+from features import CUSTOMER_FEATURES
+from store import SalesStore
+from sql_backend import DuckDBSales, compare_kpis, AVAILABLE as SQL_AVAILABLE
+from segmentation import silhouette_sweep, fit_segments, best_k
+from perf import Profiler
+from figures import scatter, payload_bytes
+from jobs import JobRunner
+from report import REPORTS_DIR, list_reports, load_report, sales_figures
 
 # --- Configuration de la page Streamlit ---
 st.set_page_config(
@@ -69,50 +77,370 @@ def metric_card(title, value, bg_color):
     """
     return html
 
+# --- Instrumentation optionnelle (panneau « Performance ») ---
+perf_panel = st.sidebar.toggle("Performance", help="Temps et lignes de chaque étape")
+# tracemalloc ralentit nettement les calculs : mesure mémoire activée séparément
+perf_memory = perf_panel and st.sidebar.checkbox("Mesurer le pic mémoire (plus lent)")
+prof = Profiler(enabled=perf_panel, memory=perf_memory)
+
+def plotly_chart(fig, **kwargs):
+    # Sérialisation Plotly et envoi au navigateur, mesurés comme une étape
+    with prof.stage(f"figure : {fig.layout.title.text}") as rec:
+        if prof.enabled:
+            rec["taille_figure_ko"] = payload_bytes(fig) / 1024
+        st.plotly_chart(fig, **kwargs)
+
 # --- Chargement du fichier ZIP ---
 st.sidebar.header("Chargement des données")
-uploaded_zip = st.sidebar.file_uploader("Charger le fichier ZIP (12 CSV)", type=["zip"])
+sources = ("Archive ZIP", "Historique incrémental") + (("Rapport précalculé",) if REPORTS_DIR else ())
+source = st.sidebar.radio("Source", sources, horizontal=True)
+uploaded_zip = new_files = report_choice = None
+if source == "Archive ZIP":
+    uploaded_zip = st.sidebar.file_uploader("Charger le fichier ZIP (12 CSV)", type=["zip"])
+elif source == "Rapport précalculé":
+    # Tables écrites par report.py : aucune lecture des ventes
+    report_choice = st.sidebar.selectbox("Rapport", list_reports(REPORTS_DIR, "ventes"))
+else:
+    # Seul le nouveau mois est lu et nettoyé ; les agrégats de l'historique sont mis à jour
+    new_files = st.sidebar.file_uploader("Ajouter un mois (CSV ou ZIP)", type=["csv", "zip"], accept_multiple_files=True)
+
+frame_cache = FrameCache()
+# Résultats des onglets partagés entre sessions et processus du serveur (voir cache.py) ;
+# une seule instance par processus : le niveau mémoire et les compteurs survivent aux reruns
+@st.cache_resource(show_spinner=False)
+def result_cache():
+    return ResultCache()
+
+results = result_cache()
 
+# Exécuté par le job d'arrière-plan du fichier (voir plus bas) : pas d'appel Streamlit ici
+def load_and_merge_zip(digest, zip_bytes):
+    # Cache disque partagé entre redémarrages et réplicas
+    key = f"ventes-{digest}"
+    data = frame_cache.get(key)
+    if data is None:
+        # Lecture parallèle, colonnes utiles uniquement, types explicites (voir ingestion.py)
+        data = clean_sales(load_sales_zip(zip_bytes))
+        # Catégories et entiers réduits : filtres et groupby travaillent sur des codes entiers
+        data = compact_frame(data, SALES_CATEGORIES)
+        frame_cache.put(key, data)
+    return data
+
+# Rapport précalculé : tables relues une fois par version du manifeste
 @st.cache_data(show_spinner=True)
-def load_and_merge_zip(uploaded_zip_bytes):
-    with zipfile.ZipFile(io.BytesIO(uploaded_zip_bytes)) as z:
-        csv_files = [f for f in z.namelist() if f.endswith('.csv')]
-        df_list = []
-        for file in csv_files:
-            with z.open(file) as f:
-                df = pd.read_csv(f)
-                df_list.append(df)
-    return pd.concat(df_list, ignore_index=True)
-
-if uploaded_zip:
+def report_tables(digest, directory):
+    _, tables = load_report(directory, "ventes")
+    return tables
+
+# Historique partagé entre sessions, persisté sur disque
+@st.cache_resource(show_spinner=False)
+def sales_store():
+    return SalesStore("ventes")
+
+@st.cache_data(show_spinner=True)
+def store_data(version, _store):
+    return _store.data()
+
+@st.cache_data(show_spinner=False)
+def dataset_memory(digest, _data):
+    return memory_report(_data)
+
+# Base DuckDB partagée entre sessions (une connexion n'est pas sérialisable : cache_resource)
+@st.cache_resource(show_spinner=False)
+def build_sales_sql(digest, _data):
+    return DuckDBSales(_data)
+
+# Index ville -> lignes : le filtre Villes ne relit pas les adresses
+@st.cache_data(show_spinner=False)
+def build_city_index(digest, _data):
+    return InvertedIndex(_data["City"])
+
+# Séries temporelles heure/jour/semaine/mois, construites une fois par dataset (voir timeseries.py)
+@st.cache_data(show_spinner=False)
+def build_sales_series(digest, _data):
+    return SalesSeries(_data)
+
+# --- Calculs par onglet, mémoïsés par (dataset, filtres, paramètres) ---
+# `scope` identifie le dataset, le moteur et les filtres : seuls les paramètres propres à
+# un onglet invalident ses résultats, et seul l'onglet affiché est calculé. Les arguments
+# préfixés par « _ » ne font pas partie de la clé du cache partagé.
+@results.memoize
+def sales_overview(scope, _engine, _filters):
+    return (_engine.kpis(_filters),
+            _engine.rollup(["Month"], ["Sales"], _filters),
+            _engine.rollup(["Product"], ["Quantity Ordered"], _filters))
+
+@results.memoize
+def basket_combos(scope, size, top_n, _data, _engine, _filters):
+    if scope[1] == "DuckDB":
+        return _engine.top_product_combinations(size, top_n, _filters)
+    return top_product_combinations(_data, size=size, top_n=top_n)
+
+@results.memoize
+def customer_features(scope, _data, _engine, _filters, _features=None):
+    if _features is not None:
+        return _features.table()  # agrégats clients tenus à jour par l'historique
+    if scope[1] == "DuckDB":
+        return _engine.customer_table(_filters)
+    return customer_table(_data)
+
+@results.memoize
+def optimal_k(scope, _X):
+    return best_k(silhouette_sweep(_X))
+
+@results.memoize
+def customer_segments(scope, n_clusters, _data, _cust, _X):
+    cust = _cust.copy()
+    cust["Cluster"] = fit_segments(_X, n_clusters)
+    top_products = segment_top_products(_data, cust, top_n=5) if "Product" in _data.columns else None
+    return cust, segment_summary(cust), top_products
+
+@results.memoize
+def customer_pca(scope, _X):
+    return pca_projection(_X)
+
+@results.memoize
+def pca_figure(scope, n_clusters, _cust, _pca_feats):
+    cust = _cust.assign(PCA1=_pca_feats[:, 0], PCA2=_pca_feats[:, 1])
+    # Au-delà du budget de points, bulles par cellule : la figure ne grossit plus avec les clients
+    fig = scatter(cust, x="PCA1", y="PCA2", color="Cluster",
+                  title="PCA - Segmentation Clients",
+                  template="plotly_white",
+                  color_continuous_scale=["#5F9EA0", "#1E90FF", "#708090"])
+    fig.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
+    return fig
+
+@results.memoize
+def vision360(scope, _engine, _filters):
+    return (financial_kpis(_engine.kpis(_filters)["total_sales"]),
+            monthly_financials(_engine.rollup(["Month"], ["Sales"], _filters)),
+            name_weekdays(_engine.rollup(["Weekday"], ["Sales"], _filters)))
+
+# Tendance du CA à la granularité choisie : lue dans les cuboïdes précalculés de la série
+@results.memoize
+def sales_trend(scope, granularity, _series, _filters):
+    return _series.trend(granularity, "Sales", filters=_filters)
+
+# --- Précalculs en arrière-plan (voir jobs.py) ---
+# Pool partagé entre sessions : un fichier déjà en cours de traitement n'est pas relancé
+@st.cache_resource(show_spinner=False)
+def job_runner():
+    return JobRunner()
+
+def default_view(digest, cube):
+    # Vue initiale des onglets (moteur pandas, tous les mois, sans ville) : mêmes clés de cache
+    months = list(cube.months)
+    return (digest, "pandas", (), tuple(months)), {"Month": months}
+
+def precompute_steps(digest, zip_bytes):
+    # Étapes dans l'ordre d'affichage : les premiers graphiques n'attendent pas la silhouette
+    def view(r):
+        return default_view(digest, r["cube"])
+
+    def baskets(r):
+        scope, filters = view(r)
+        for size in (2, 3):
+            basket_combos(scope, size, 5, r["donnees"], r["cube"], filters)
+
+    def silhouette(r):
+        scope, _ = view(r)
+        optimal_k(scope + (tuple(SEGMENT_FEATURES),), scale_features(r["table clients"], SEGMENT_FEATURES))
+
+    return [
+        ("donnees", lambda r: load_and_merge_zip(digest, zip_bytes)),
+        ("cube", lambda r: SalesCube(r["donnees"])),
+        ("index villes", lambda r: InvertedIndex(r["donnees"]["City"])),
+        ("séries temporelles", lambda r: SalesSeries(r["donnees"])),
+        ("KPI et agrégats", lambda r: sales_overview(view(r)[0], r["cube"], view(r)[1])),
+        ("paniers", baskets),
+        ("table clients", lambda r: customer_features(view(r)[0], r["donnees"], r["cube"], view(r)[1])),
+        ("silhouette", silhouette),
+    ]
+
+# Identifiant de session : un nouveau fichier libère le job du précédent
+job_owner = st.session_state.setdefault("job_owner", uuid.uuid4().hex)
+job = None
+
+def show_progress(job, slot):
+    fraction, current = job.progress()
+    slot.progress(fraction, text=f"Précalculs : {current or 'terminés'}")
+
+def wait_for(step):
+    # Vue par défaut : attend le résultat du job plutôt que de le recalculer en parallèle
+    if job is not None and scope == job_scope:
+        try:
+            with st.spinner(f"Précalcul en cours : {step}..."):
+                job.wait(step)
+        except Exception:
+            pass  # étape en échec ou annulée : calcul direct
+
+store = None
+if source == "Historique incrémental":
+    store = sales_store()
+    if new_files and st.sidebar.button("Ajouter à l'historique"):
+        for new_file in new_files:
+            stats = store.append(new_file.getvalue(), new_file.name)
+            if stats is None:
+                st.sidebar.info(f"{new_file.name} : déjà intégré.")
+            else:
+                st.sidebar.write(f"{new_file.name} : {stats['lignes']} lignes ajoutées, {stats['doublons']} doublons ignorés.")
+    with st.sidebar.expander(f"Historique ({len(store.files)} fichiers)"):
+        if store.files:
+            st.dataframe(pd.DataFrame(store.files).drop(columns="digest"), hide_index=True)
+        if st.button("Vider l'historique"):
+            store.clear()
+            st.rerun()
+    if store.cube is None:
+        st.sidebar.write("Historique vide : ajoutez un premier fichier.")
+
+if not uploaded_zip:
+    job_runner().release(job_owner)
+
+if source == "Rapport précalculé":
+    if not report_choice:
+        st.sidebar.write("Aucun rapport de ventes disponible : générez-en un avec report.py.")
+        st.stop()
+    directory = os.path.realpath(os.path.join(REPORTS_DIR, report_choice))
+    try:
+        tables = report_tables(file_digest(os.path.join(directory, "manifest.json")), directory)
+        report_figs = sales_figures(tables)
+    except (KeyError, OSError) as e:
+        st.error(f"Rapport illisible : {e}")
+        st.stop()
+    # Agrégats calculés sur l'ensemble des données par report.py
+    st.sidebar.info("Rapport précalculé : agrégats sur toutes les données, sans filtres ni segmentation interactive.")
+    kpis = tables["kpis"].to_dict("records")[0]
+    for fig in report_figs.values():
+        fig.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
+    tabs = st.tabs(["📊 Dashboard Ventes", "👥 Segmentation Clients", "🔄 Vision 360"], key="onglet", on_change="rerun")
+
+    with tabs[0]:
+        if tabs[0].open:
+            st.subheader("Dashboard Ventes")
+            col1, col2, col3 = st.columns(3)
+            col1.markdown(metric_card("Chiffre d'Affaires Total", f"{kpis['total_sales']:,.2f} €", "#2E8B57"), unsafe_allow_html=True)
+            col2.markdown(metric_card("Nombre de Commandes", kpis["total_orders"], "#1E90FF"), unsafe_allow_html=True)
+            col3.markdown(metric_card("Nombre de Clients", kpis["total_customers"], "#4682B4"), unsafe_allow_html=True)
+            st.markdown("---")
+            plotly_chart(report_figs["ventes_par_mois"], use_container_width=True, config={"displayModeBar": False})
+            left_chart, right_chart = st.columns(2)
+            with left_chart:
+                plotly_chart(report_figs["ventes_par_produit"], use_container_width=True, config={"displayModeBar": False})
+            with right_chart:
+                st.markdown("#### Combinaisons de Produits")
+                st.dataframe(tables["combinaisons_produits"], hide_index=True)
+
+    with tabs[1]:
+        if tabs[1].open:
+            st.subheader("Segmentation Clients")
+            st.success(f"Nombre de segments du rapport : {kpis['segments']}")
+            st.dataframe(tables["clients"].head(10), height=240)
+            col_a, col_b = st.columns(2)
+            with col_a:
+                plotly_chart(report_figs["clients_par_segment"], use_container_width=True, config={"displayModeBar": False})
+            with col_b:
+                plotly_chart(report_figs["ca_par_segment"], use_container_width=True, config={"displayModeBar": False})
+            st.subheader("Top Produits par Segment")
+            top_products = tables["top_produits_par_segment"]
+            clusters = sorted(top_products["Cluster"].unique())
+            for i in range(0, len(clusters), 3):
+                cols = st.columns(min(3, len(clusters)-i))
+                for j, c in enumerate(clusters[i:i+3]):
+                    with cols[j]:
+                        st.markdown(f"**Segment {c}**")
+                        st.dataframe(top_products[top_products["Cluster"] == c].drop(columns="Cluster"), height=180, hide_index=True)
+            plotly_chart(report_figs["pca_segments"], use_container_width=True, config={"displayModeBar": False})
+
+    with tabs[2]:
+        if tabs[2].open:
+            st.subheader("Vision 360°")
+            col1, col2, col3, col4 = st.columns(4)
+            col1.markdown(metric_card("Revenu", f"${kpis['revenue']/1_000_000:.2f}M", "#1E90FF"), unsafe_allow_html=True)
+            col2.markdown(metric_card("Dépenses", f"${kpis['expenses']/1_000_000:.2f}M", "#708090"), unsafe_allow_html=True)
+            col3.markdown(metric_card("Marge Brute", f"${kpis['gross_profit']/1_000_000:.2f}M", "#003366"), unsafe_allow_html=True)
+            col4.markdown(metric_card("Marge Nette", f"${kpis['net_profit']/1_000_000:.2f}M", "#2E8B57"), unsafe_allow_html=True)
+            st.markdown("---")
+            fin_left, fin_right = st.columns(2)
+            with fin_left:
+                plotly_chart(report_figs["vision360_mensuel"], use_container_width=True, config={"displayModeBar": False})
+            with fin_right:
+                plotly_chart(report_figs["croissance_mensuelle"], use_container_width=True, config={"displayModeBar": False})
+            plotly_chart(report_figs["ventes_par_jour"], use_container_width=True, config={"displayModeBar": False})
+
+elif uploaded_zip or (store is not None and store.cube is not None):
     try:
-        data = load_and_merge_zip(uploaded_zip.read())
+        with prof.stage("chargement") as rec:
+            if store is not None:
+                digest = store.version
+                data = store_data(digest, store)
+                cube = store.cube
+            else:
+                zip_bytes = uploaded_zip.getvalue()
+                digest = content_digest(zip_bytes)
+                # Lecture, cube et précalculs démarrent en arrière-plan ; seuls données et cube sont attendus
+                job = job_runner().submit(f"ventes-{digest}", precompute_steps(digest, zip_bytes), job_owner)
+                slot = st.sidebar.empty()
+                data = job.wait("donnees", on_wait=lambda j: show_progress(j, slot))
+                cube = job.wait("cube", on_wait=lambda j: show_progress(j, slot))
+                slot.empty()
+            rec["lignes_sortie"] = len(data)
+        prof.meta["dataset"] = digest
         st.success("Données chargées et fusionnées avec succès !")
     except Exception as e:
         st.error(f"Erreur lors du chargement des données : {e}")
         st.stop()
 
-    # --- Nettoyage & transformation ---
-    data.dropna(inplace=True)
-    data["Quantity Ordered"] = pd.to_numeric(data["Quantity Ordered"], errors="coerce")
-    data["Price Each"] = pd.to_numeric(data["Price Each"], errors="coerce")
-    data.dropna(inplace=True)
-    data["Order Date"] = pd.to_datetime(data["Order Date"], format="%m/%d/%y %H:%M", errors="coerce")
-    data.dropna(subset=["Order Date"], inplace=True)
-    data["Month"] = data["Order Date"].dt.month
-    data["Hour"] = data["Order Date"].dt.hour
-    data["Sales"] = data["Quantity Ordered"] * data["Price Each"]
+    with st.sidebar.expander("Mémoire du dataset"):
+        st.dataframe(dataset_memory(digest, data), hide_index=True)
 
     # --- Filtres dans la barre latérale ---
     st.sidebar.header("🔎 Filtres Stratégiques")
-    villes = st.sidebar.multiselect("Villes", options=sorted(data["Purchase Address"].unique()))
-    mois = st.sidebar.multiselect("Mois", options=sorted(data["Month"].unique()), default=sorted(data["Month"].unique()))
-    if villes:
-        data = data[data["Purchase Address"].isin(villes)]
-    data = data[data["Month"].isin(mois)]
+    city_index = job.wait("index villes") if job is not None else build_city_index(digest, data)
+    series = job.wait("séries temporelles") if job is not None else build_sales_series(digest, data)
+    villes = st.sidebar.multiselect("Villes", options=list(city_index.values))
+    mois = st.sidebar.multiselect("Mois", options=list(cube.months), default=list(cube.months))
+    moteur = st.sidebar.radio("Moteur de calcul", ("pandas", "DuckDB") if SQL_AVAILABLE else ("pandas",), horizontal=True)
+    if moteur == "DuckDB":
+        # Filtres, groupements et top-N exécutés par DuckDB
+        engine = build_sales_sql(digest, data)
+    with prof.stage("filtres", len(data)) as rec:
+        if villes:
+            # Lignes des villes retenues lues dans l'index : coût proportionnel à la sélection
+            data = data.iloc[city_index.rows(villes)]
+        data = data[data["Month"].isin(mois)]
+        rec["lignes_sortie"] = len(data)
+    # KPI et graphiques agrégés sont servis par le cube ; `data` reste utile aux paniers et segments
+    filters = {"Month": mois, **({"City": villes} if villes else {})}
+    if moteur == "DuckDB":
+        if st.sidebar.checkbox("Comparer avec pandas"):
+            # Le cube pandas reste la référence pour recouper les KPI
+            ecarts = compare_kpis(cube.kpis(filters), engine.kpis(filters))
+            if ecarts:
+                st.sidebar.warning(f"Écarts DuckDB / pandas : {', '.join(ecarts)}")
+            else:
+                st.sidebar.success("DuckDB et pandas concordent.")
+    else:
+        engine = cube
+    scope = (digest, moteur, tuple(villes), tuple(mois))
+    job_scope = default_view(digest, cube)[0] if job is not None else None
+    if job is not None:
+        with st.sidebar.expander("Précalculs"):
+            st.dataframe(job.frame(), hide_index=True)
+        if not job.done:
+            # Progression rafraîchie seule ; un rerun complet une fois les précalculs terminés
+            @st.fragment(run_every=1)
+            def job_progress():
+                if job.done:
+                    st.rerun()
+                show_progress(job, st)
+
+            with st.sidebar:
+                job_progress()
+    prof.meta["moteur"] = moteur
 
     # --- Création des onglets ---
-    tabs = st.tabs(["📊 Dashboard Ventes", "👥 Segmentation Clients", "🔄 Vision 360"])
+    # Exécution paresseuse : seul l'onglet sélectionné est calculé à chaque rerun
+    tabs = st.tabs(["📊 Dashboard Ventes", "👥 Segmentation Clients", "🔄 Vision 360"], key="onglet", on_change="rerun")
 
     # Onglet Vision 360 (contenu à enrichir ultérieurement)
     if len(tabs) > 2:
@@ -126,238 +454,246 @@ if uploaded_zip:
     # Onglet 1 : Dashboard Ventes
     # =========================
     with tabs[0]:
-        st.subheader("Dashboard Ventes")
-        # Calcul des KPI
-        total_sales = data["Sales"].sum()
-        total_orders = data["Order ID"].nunique()
-        total_customers = data["Purchase Address"].nunique()
-
-        # Affichage dans des metric cards compactes, avec des teintes froides
-        col1, col2, col3 = st.columns(3)
-        col1.markdown(metric_card("Chiffre d'Affaires Total", f"{total_sales:,.2f} €", "#2E8B57"), unsafe_allow_html=True)
-        col2.markdown(metric_card("Nombre de Commandes", total_orders, "#1E90FF"), unsafe_allow_html=True)
-        col3.markdown(metric_card("Nombre de Clients", total_customers, "#4682B4"), unsafe_allow_html=True)
-
-        st.markdown("---")
-        st.markdown("#### Ventes par Mois")
-        monthly_sales = data.groupby("Month")["Sales"].sum().reset_index()
-        fig_month = px.bar(monthly_sales, x="Month", y="Sales",
-                           title="CA par Mois",
-                           text_auto=True,
-                           color="Sales",
-                           color_continuous_scale=["#1E90FF", "#4682B4"],
-                           template="plotly_white")
-        fig_month.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
-        st.plotly_chart(fig_month, use_container_width=True, config={"displayModeBar": False})
-
-        st.markdown("---")
-        # Graphiques côte à côte : Ventes par Produit et Combinaisons de Produits
-        left_chart, right_chart = st.columns(2)
-        with left_chart:
-            st.markdown("#### Ventes par Produit")
-            if {"Product", "Quantity Ordered"}.issubset(data.columns):
-                product_sales = data.groupby("Product")["Quantity Ordered"].sum().reset_index()
-                fig_prod = px.bar(product_sales, x="Product", y="Quantity Ordered",
-                                  title="Ventes par Produit",
-                                  color="Quantity Ordered",
-                                  color_continuous_scale=["#1E90FF", "#5F9EA0"],
-                                  template="plotly_white")
-                fig_prod.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
-                st.plotly_chart(fig_prod, use_container_width=True, config={"displayModeBar": False})
-            else:
-                st.warning("Impossible d'afficher les ventes par produit.")
-        with right_chart:
-            st.markdown("#### Combinaisons de Produits")
-            if {"Order ID", "Product"}.issubset(data.columns):
-                basket = data.groupby("Order ID")["Product"].apply(list).reset_index()
-                combo_counter = Counter()
-                for products in basket["Product"]:
-                    combos = combinations(sorted(set(products)), 2)
-                    combo_counter.update(combos)
-                top_combos = combo_counter.most_common(5)
-                if top_combos:
-                    st.write("5 combinaisons de produits les plus fréquentes :")
-                    for combo, count in top_combos:
-                        st.write(f"- **{combo[0]}** & **{combo[1]}** : {count} fois")
+        if tabs[0].open:
+            st.subheader("Dashboard Ventes")
+            # Calcul des KPI
+            wait_for("KPI et agrégats")
+            with prof.stage("KPI et agrégats"):
+                kpis, month_sales, product_quantities = sales_overview(scope, engine, filters)
+
+            # Affichage dans des metric cards compactes, avec des teintes froides
+            col1, col2, col3 = st.columns(3)
+            col1.markdown(metric_card("Chiffre d'Affaires Total", f"{kpis['total_sales']:,.2f} €", "#2E8B57"), unsafe_allow_html=True)
+            col2.markdown(metric_card("Nombre de Commandes", kpis["total_orders"], "#1E90FF"), unsafe_allow_html=True)
+            col3.markdown(metric_card("Nombre de Clients", kpis["total_customers"], "#4682B4"), unsafe_allow_html=True)
+
+            st.markdown("---")
+            st.markdown("#### Ventes par Mois")
+            fig_month = px.bar(month_sales, x="Month", y="Sales",
+                               title="CA par Mois",
+                               text_auto=True,
+                               color="Sales",
+                               color_continuous_scale=["#1E90FF", "#4682B4"],
+                               template="plotly_white")
+            fig_month.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
+            plotly_chart(fig_month, use_container_width=True, config={"displayModeBar": False})
+
+            st.markdown("---")
+            # Graphiques côte à côte : Ventes par Produit et Combinaisons de Produits
+            left_chart, right_chart = st.columns(2)
+            with left_chart:
+                st.markdown("#### Ventes par Produit")
+                if {"Product", "Quantity Ordered"}.issubset(data.columns):
+                    fig_prod = px.bar(product_quantities, x="Product", y="Quantity Ordered",
+                                      title="Ventes par Produit",
+                                      color="Quantity Ordered",
+                                      color_continuous_scale=["#1E90FF", "#5F9EA0"],
+                                      template="plotly_white")
+                    fig_prod.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
+                    plotly_chart(fig_prod, use_container_width=True, config={"displayModeBar": False})
                 else:
-                    st.info("Pas de combinaisons trouvées.")
-            else:
-                st.warning("Colonnes 'Order ID' et 'Product' manquantes.")
+                    st.warning("Impossible d'afficher les ventes par produit.")
+            with right_chart:
+                st.markdown("#### Combinaisons de Produits")
+                if {"Order ID", "Product"}.issubset(data.columns):
+                    combo_left, combo_right = st.columns(2)
+                    combo_size = combo_left.selectbox("Produits par combinaison", (2, 3), key="combo_size")
+                    combo_top = combo_right.number_input("Nombre de combinaisons", 1, 50, 5, key="combo_top")
+                    wait_for("paniers")
+                    with prof.stage("paniers", len(data)) as rec:
+                        top_combos = basket_combos(scope, combo_size, combo_top, data, engine, filters)
+                        rec["lignes_sortie"] = len(top_combos)
+                    if top_combos:
+                        st.write(f"{combo_top} combinaisons de produits les plus fréquentes :")
+                        for combo, count in top_combos:
+                            st.write("- " + " & ".join(f"**{p}**" for p in combo) + f" : {count} fois")
+                    else:
+                        st.info("Pas de combinaisons trouvées.")
+                else:
+                    st.warning("Colonnes 'Order ID' et 'Product' manquantes.")
 
     # =========================
     # Onglet 2 : Segmentation Clients
     # =========================
     with tabs[1]:
-        st.subheader("Segmentation Clients")
-        cust = data.groupby("Purchase Address").agg({
-            "Sales": "sum",
-            "Order ID": pd.Series.nunique,
-            "Quantity Ordered": "sum"
-        }).reset_index()
-        cust.rename(columns={"Order ID": "NbCmd"}, inplace=True)
-        st.dataframe(cust.head(10), height=240)
-        st.markdown("---")
-        st.subheader("Détermination du Nombre Optimal de Clusters")
-        feats = cust[["Sales", "NbCmd", "Quantity Ordered"]]
-        X = StandardScaler().fit_transform(feats)
-        seg_mode = st.radio("Mode de segmentation", ("Manuel", "Automatique (Silhouette)"))
-        if seg_mode == "Automatique (Silhouette)":
-            scores = {}
-            for k in range(2, 11):
-                preds = KMeans(n_clusters=k, random_state=42).fit_predict(X)
-                scores[k] = silhouette_score(X, preds)
-            best_k = max(scores, key=scores.get)
-            st.success(f"Nombre optimal de clusters : {best_k}")
-            n_clusters = best_k
-        else:
-            n_clusters = st.slider("Nombre de segments", 2, 10, 3)
-        st.markdown("---")
-        st.subheader("Application du Clustering")
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42).fit(X)
-        cust["Cluster"] = kmeans.labels_
+        if tabs[1].open:
+            st.subheader("Segmentation Clients")
+            # Sans filtre, les agrégats clients incrémentaux de l'historique sont utilisés tels quels
+            unfiltered = store is not None and not villes and set(mois) == set(store.cube.months)
+            wait_for("table clients")
+            with prof.stage("table clients", len(data)) as rec:
+                cust = customer_features(scope, data, engine, filters, store.features if unfiltered else None)
+                rec["lignes_sortie"] = len(cust)
+            st.dataframe(cust.head(10), height=240)
+            # Les variables retenues sont lues dans la table clients, sans réagréger les lignes
+            features = st.multiselect("Variables de segmentation", CUSTOMER_FEATURES, default=SEGMENT_FEATURES,
+                                      help="Recence : jours depuis le dernier achat ; HeurePreferee : heure d'achat la plus fréquente.")
+            features = features or SEGMENT_FEATURES
+            X = scale_features(cust, features)
+            seg_scope = scope + (tuple(features),)
+            st.markdown("---")
+            st.subheader("Détermination du Nombre Optimal de Clusters")
+            seg_mode = st.radio("Mode de segmentation", ("Manuel", "Automatique (Silhouette)"))
+            if seg_mode == "Automatique (Silhouette)":
+                # Ajustements mémoïsés : le k retenu n'est pas réajusté plus bas
+                if features == SEGMENT_FEATURES:
+                    wait_for("silhouette")
+                with prof.stage("silhouette (k optimal)", len(X)):
+                    n_clusters = optimal_k(seg_scope, X)
+                if n_clusters is not None:
+                    st.success(f"Nombre optimal de clusters : {n_clusters}")
+            else:
+                n_clusters = st.slider("Nombre de segments", 2, 10, 3)
+            if n_clusters is None or n_clusters >= len(X):
+                # Filtres trop restrictifs : pas assez de clients pour former les segments
+                st.info(f"Segmentation impossible : {len(X)} client(s) retenu(s) par les filtres, il en faut au moins {(n_clusters or 2) + 1}.")
+            else:
+                st.markdown("---")
+                st.subheader("Application du Clustering")
+                with prof.stage("clustering", len(X)) as rec:
+                    cust, (seg_count, seg_sales), top_products = customer_segments(seg_scope, n_clusters, data, cust, X)
+                    rec["lignes_sortie"] = len(cust)
         
-        st.markdown("#### Répartition et CA par Segment")
-        col_a, col_b = st.columns(2)
-        with col_a:
-            seg_count = cust["Cluster"].value_counts().reset_index()
-            seg_count.columns = ["Cluster", "Clients"]
-            fig_seg_count = px.bar(seg_count, x="Cluster", y="Clients",
-                                   title="Clients par Segment",
-                                   template="plotly_white",
-                                   color="Clients",
-                                   color_continuous_scale=["#1E90FF", "#5F9EA0"])
-            fig_seg_count.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
-            st.plotly_chart(fig_seg_count, use_container_width=True, config={"displayModeBar": False})
-        with col_b:
-            seg_sales = cust.groupby("Cluster")["Sales"].sum().reset_index()
-            seg_sales["Prop (%)"] = 100 * seg_sales["Sales"] / seg_sales["Sales"].sum()
-            fig_seg_sales = px.pie(seg_sales, names="Cluster", values="Prop (%)",
-                                   title="Répartition du CA par Segment",
-                                   template="plotly_white",
-                                   hole=0.4,
-                                   color_discrete_sequence=["#5F9EA0", "#708090", "#1E90FF"])
-            fig_seg_sales.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
-            st.plotly_chart(fig_seg_sales, use_container_width=True, config={"displayModeBar": False})
+                st.markdown("#### Répartition et CA par Segment")
+                col_a, col_b = st.columns(2)
+                with col_a:
+                    fig_seg_count = px.bar(seg_count, x="Cluster", y="Clients",
+                                           title="Clients par Segment",
+                                           template="plotly_white",
+                                           color="Clients",
+                                           color_continuous_scale=["#1E90FF", "#5F9EA0"])
+                    fig_seg_count.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
+                    plotly_chart(fig_seg_count, use_container_width=True, config={"displayModeBar": False})
+                with col_b:
+                    fig_seg_sales = px.pie(seg_sales, names="Cluster", values="Prop (%)",
+                                           title="Répartition du CA par Segment",
+                                           template="plotly_white",
+                                           hole=0.4,
+                                           color_discrete_sequence=["#5F9EA0", "#708090", "#1E90FF"])
+                    fig_seg_sales.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
+                    plotly_chart(fig_seg_sales, use_container_width=True, config={"displayModeBar": False})
         
-        st.markdown("---")
-        st.subheader("Top Produits par Segment")
-        # Affichage des top produits de chaque cluster côte à côte (groupés par 3)
-        merged = pd.merge(data, cust[["Purchase Address", "Cluster"]], on="Purchase Address", how="left")
-        clusters = sorted(cust["Cluster"].unique())
-        for i in range(0, len(clusters), 3):
-            cols = st.columns(min(3, len(clusters)-i))
-            for j, c in enumerate(clusters[i:i+3]):
-                with cols[j]:
-                    st.markdown(f"**Segment {c}**")
-                    cluster_data = merged[merged["Cluster"] == c]
-                    if "Product" in cluster_data.columns:
-                        p_counts = cluster_data.groupby("Product")["Quantity Ordered"].sum().reset_index().sort_values(by="Quantity Ordered", ascending=False)
-                        st.dataframe(p_counts.head(5), height=180)
-                    else:
-                        st.info("Colonne 'Product' manquante.")
-        st.markdown("---")
-        st.subheader("Visualisation des Segments (PCA)")
-        pca = PCA(n_components=2)
-        pca_feats = pca.fit_transform(X)
-        cust["PCA1"], cust["PCA2"] = pca_feats[:, 0], pca_feats[:, 1]
-        fig_pca = px.scatter(cust, x="PCA1", y="PCA2", color="Cluster",
-                             title="PCA - Segmentation Clients",
-                             template="plotly_white",
-                             color_continuous_scale=["#5F9EA0", "#1E90FF", "#708090"])
-        fig_pca.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
-        st.plotly_chart(fig_pca, use_container_width=True, config={"displayModeBar": False})
+                st.markdown("---")
+                st.subheader("Top Produits par Segment")
+                # Affichage des top produits de chaque cluster côte à côte (groupés par 3)
+                clusters = sorted(cust["Cluster"].unique())
+                for i in range(0, len(clusters), 3):
+                    cols = st.columns(min(3, len(clusters)-i))
+                    for j, c in enumerate(clusters[i:i+3]):
+                        with cols[j]:
+                            st.markdown(f"**Segment {c}**")
+                            if "Product" in data.columns:
+                                st.dataframe(top_products[c], height=180)
+                            else:
+                                st.info("Colonne 'Product' manquante.")
+                st.markdown("---")
+                st.subheader("Visualisation des Segments (PCA)")
+                with prof.stage("PCA", len(X)):
+                    pca_feats = customer_pca(seg_scope, X)
+                fig_pca = pca_figure(seg_scope, n_clusters, cust, pca_feats)
+                plotly_chart(fig_pca, use_container_width=True, config={"displayModeBar": False})
 
     # =========================
     # Onglet 3 : Vision 360
     # =========================
     with tabs[2]:
-        st.subheader("Vision 360°")
-        # KPI financiers (exemple)
-        revenue = data["Sales"].sum()
-        expenses = revenue * 0.2  # hypothèse de 20%
-        gross_profit = revenue - expenses
-        net_profit = gross_profit * 0.8
-        
-        # Affichage des KPI financiers dans 4 metric cards aux tons froids
-        col1, col2, col3, col4 = st.columns(4)
-        col1.markdown(metric_card("Revenu", f"${revenue/1_000_000:.2f}M", "#1E90FF"), unsafe_allow_html=True)
-        col2.markdown(metric_card("Dépenses", f"${expenses/1_000_000:.2f}M", "#708090"), unsafe_allow_html=True)
-        col3.markdown(metric_card("Marge Brute", f"${gross_profit/1_000_000:.2f}M", "#003366"), unsafe_allow_html=True)
-        col4.markdown(metric_card("Marge Nette", f"${net_profit/1_000_000:.2f}M", "#2E8B57"), unsafe_allow_html=True)
+        if tabs[2].open:
+            st.subheader("Vision 360°")
+            # KPI financiers (exemple)
+            with prof.stage("vision 360"):
+                fin, monthly_df, day_sales = vision360(scope, engine, filters)  # hypothèse de 20% de dépenses
         
-        st.markdown("---")
-        # Graphiques financiers mensuels : Barres et Ligne côte à côte
-        monthly_df = data.groupby("Month")["Sales"].sum().reset_index().rename(columns={"Sales": "Revenue"})
-        monthly_df["Expenses"] = monthly_df["Revenue"] * 0.2
-        monthly_df["Net_Profit"] = monthly_df["Revenue"] - monthly_df["Expenses"]
-        monthly_df["Growth"] = monthly_df["Revenue"].pct_change().fillna(0) * 100
+            # Affichage des KPI financiers dans 4 metric cards aux tons froids
+            col1, col2, col3, col4 = st.columns(4)
+            col1.markdown(metric_card("Revenu", f"${fin['revenue']/1_000_000:.2f}M", "#1E90FF"), unsafe_allow_html=True)
+            col2.markdown(metric_card("Dépenses", f"${fin['expenses']/1_000_000:.2f}M", "#708090"), unsafe_allow_html=True)
+            col3.markdown(metric_card("Marge Brute", f"${fin['gross_profit']/1_000_000:.2f}M", "#003366"), unsafe_allow_html=True)
+            col4.markdown(metric_card("Marge Nette", f"${fin['net_profit']/1_000_000:.2f}M", "#2E8B57"), unsafe_allow_html=True)
         
-        fin_left, fin_right = st.columns(2)
-
-        with fin_left:
-            st.markdown("#### Revenu, Dépenses et Bénéfice (Mensuel)")
-            fig_fin = px.bar(
-                monthly_df,
-                x="Month",
-                y=["Revenue", "Expenses", "Net_Profit"],
-                barmode="stack",  # affichage en tirroir (stacked bars)
-                text_auto=True,
-                title="Analyse Mensuelle",
-                template="plotly_white",
-                # Palette froide sans vert
-                color_discrete_sequence=["#003366", "#444444", "#2E8B57"]
-            )
-            # Réduction des gaps pour l'effet "tirroir"
-            fig_fin.update_layout(
-                height=450,
-                margin=dict(l=20, r=20, t=40, b=20),
-                bargap=0.05
-            )
-            # Personnalisation des textes pour une meilleure lisibilité
-            fig_fin.update_traces(textfont=dict(color="white"), cliponaxis=True)
-            st.plotly_chart(fig_fin, use_container_width=True, config={"displayModeBar": False})
+            st.markdown("---")
+            # Graphiques financiers mensuels : Barres et Ligne côte à côte
         
-            with fin_right:
-                st.markdown("#### Croissance du Revenu (%)")
-                fig_growth = px.line(
+            fin_left, fin_right = st.columns(2)
+
+            with fin_left:
+                st.markdown("#### Revenu, Dépenses et Bénéfice (Mensuel)")
+                fig_fin = px.bar(
                     monthly_df,
                     x="Month",
-                    y="Growth",
-                    markers=True,
-                    title="Croissance Mensuelle",
+                    y=["Revenue", "Expenses", "Net_Profit"],
+                    barmode="stack",  # affichage en tirroir (stacked bars)
+                    text_auto=True,
+                    title="Analyse Mensuelle",
                     template="plotly_white",
-                    color_discrete_sequence=["#033366"]
+                    # Palette froide sans vert
+                    color_discrete_sequence=["#003366", "#444444", "#2E8B57"]
                 )
-                # Augmentation de l'épaisseur de la ligne et des marqueurs, avec opacité fixée à 1
-                fig_growth.update_traces(
-                    line=dict(width=4, color="#033366"), 
-                    marker=dict(size=10, opacity=1),
-                    opacity=1
+                # Réduction des gaps pour l'effet "tirroir"
+                fig_fin.update_layout(
+                    height=450,
+                    margin=dict(l=20, r=20, t=40, b=20),
+                    bargap=0.05
                 )
-                fig_growth.update_layout(height=450, margin=dict(l=20, r=20, t=40, b=20))
-                st.plotly_chart(fig_growth, use_container_width=True, config={"displayModeBar": False})
-
-
-
-        st.markdown("---")
-        # Donut chart pour la répartition par jour de la semaine
-        if "Order Date" in data.columns:
-            df_dow = data.copy()
-            df_dow["Weekday"] = df_dow["Order Date"].dt.dayofweek
-            day_sales = df_dow.groupby("Weekday")["Sales"].sum().reset_index()
-            day_map = {0: "Lundi", 1: "Mardi", 2: "Mercredi", 3: "Jeudi", 4: "Vendredi", 5: "Samedi", 6: "Dimanche"}
-            day_sales["Jour"] = day_sales["Weekday"].map(day_map)
-            st.markdown("#### Répartition du CA par Jour de la Semaine")
-            fig_donut = px.pie(day_sales, names="Jour", values="Sales",
-                               hole=0.4,
-                               title="Distribution des Ventes par Jour",
-                               template="plotly_white",
-                               color="Jour",
-                               color_discrete_sequence=["#1E90FF", "#708090", "#2E8B57", "#003366", "#5F9EA0"])
-            fig_donut.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
-            st.plotly_chart(fig_donut, use_container_width=True, config={"displayModeBar": False})
-        else:
-            st.info("Aucune colonne 'Order Date' trouvée, impossible de calculer la répartition par jour.")
+                # Personnalisation des textes pour une meilleure lisibilité
+                fig_fin.update_traces(textfont=dict(color="white"), cliponaxis=True)
+                plotly_chart(fig_fin, use_container_width=True, config={"displayModeBar": False})
+        
+                with fin_right:
+                    st.markdown("#### Croissance du Revenu (%)")
+                    fig_growth = px.line(
+                        monthly_df,
+                        x="Month",
+                        y="Growth",
+                        markers=True,
+                        title="Croissance Mensuelle",
+                        template="plotly_white",
+                        color_discrete_sequence=["#033366"]
+                    )
+                    # Augmentation de l'épaisseur de la ligne et des marqueurs, avec opacité fixée à 1
+                    fig_growth.update_traces(
+                        line=dict(width=4, color="#033366"), 
+                        marker=dict(size=10, opacity=1),
+                        opacity=1
+                    )
+                    fig_growth.update_layout(height=450, margin=dict(l=20, r=20, t=40, b=20))
+                    plotly_chart(fig_growth, use_container_width=True, config={"displayModeBar": False})
+
+
+
+            st.markdown("---")
+            # Tendance du CA : granularités précalculées, aucun regroupement des lignes au changement
+            st.markdown("#### Tendance du CA")
+            granularite = st.radio("Granularité", list(GRANULARITIES), index=1, horizontal=True)
+            with prof.stage("tendance"):
+                trend = sales_trend(scope, granularite, series, filters)
+            if len(trend):
+                last = trend.iloc[-1]
+                pct = lambda v: "n/d" if pd.isna(v) else f"{v:+.1f} %"
+                col1, col2, col3 = st.columns(3)
+                col1.markdown(metric_card("CA de la dernière période", f"${last['Sales']:,.0f}", "#1E90FF"), unsafe_allow_html=True)
+                col2.markdown(metric_card("Vs période précédente", pct(last["Croissance (%)"]), "#708090"), unsafe_allow_html=True)
+                col3.markdown(metric_card("Vs cycle précédent", pct(last["Écart cycle (%)"]), "#003366"), unsafe_allow_html=True)
+            fig_trend = px.line(trend, x=granularite, y=["Sales", "Moyenne mobile"], template="plotly_white",
+                                color_discrete_sequence=["#1E90FF", "#003366"])
+            fig_trend.update_layout(height=400, margin=dict(l=20, r=20, t=40, b=20))
+            plotly_chart(fig_trend, use_container_width=True, config={"displayModeBar": False})
+            with st.expander("Détail par période"):
+                st.dataframe(trend, hide_index=True)
+
+            st.markdown("---")
+            # Donut chart pour la répartition par jour de la semaine
+            if "Order Date" in data.columns:
+                st.markdown("#### Répartition du CA par Jour de la Semaine")
+                fig_donut = px.pie(day_sales, names="Jour", values="Sales",
+                                   hole=0.4,
+                                   title="Distribution des Ventes par Jour",
+                                   template="plotly_white",
+                                   color="Jour",
+                                   color_discrete_sequence=["#1E90FF", "#708090", "#2E8B57", "#003366", "#5F9EA0"])
+                fig_donut.update_layout(height=330, margin=dict(l=20, r=20, t=40, b=20))
+                plotly_chart(fig_donut, use_container_width=True, config={"displayModeBar": False})
+            else:
+                st.info("Aucune colonne 'Order Date' trouvée, impossible de calculer la répartition par jour.")
 
     st.markdown("---")
     st.markdown("Vous pouvez ajouter d’autres visuels ou indicateurs en bas pour enrichir encore la vue 360°.")
@@ -366,6 +702,16 @@ if uploaded_zip:
         st.subheader("Aperçu du Dataset")
         st.dataframe(data.head(), height=300)
 
+    # Compteurs relevés en fin d'exécution : ils incluent les calculs de l'onglet affiché
+    with st.sidebar.expander("Cache partagé"):
+        st.json(results.stats())
+
+    if prof.enabled:
+        with st.sidebar.expander("Performance", expanded=True):
+            st.dataframe(prof.frame(), hide_index=True)
+            st.download_button("Exporter en JSON", prof.to_json(), "performance.json", "application/json")
+            st.download_button("Exporter en CSV", prof.to_csv(), "performance.csv", "text/csv")
+
 # --- Footer personnalisé ---
 st.markdown("""
     <div class="footer">
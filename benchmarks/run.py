@@ -0,0 +1,461 @@
+"""Benchmarks des chemins chauds des dashboards.
+
+Usage (depuis la racine du dépôt) :
+
+    python -m benchmarks.run                       # échelles 1x, 10x, 100x
+    python -m benchmarks.run --scales 1 10 -k basket
+    python -m benchmarks.run --json resultats.json # pour comparer deux révisions
+
+Avant les mesures, les chemins optimisés (cubes, historiques incrémentaux, streaming, DuckDB,
+rapprochement, anomalies par blocs) sont comparés au calcul pandas direct sur le jeu
+synthétique de la plus petite échelle : un écart fait échouer l'exécution.
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import anomalies
+import ingestion
+import reconcile
+import segmentation
+from benchmarks import synthetic
+from cube import RACube, SalesCube
+from features import CustomerFeatures
+from ra_stream import BLOOM_ERROR_RATE, stream_ra_cube
+from sql_backend import DuckDBRA, DuckDBSales, compare_kpis, AVAILABLE as SQL_AVAILABLE
+from store import RAStore, SalesStore
+from timeseries import GRANULARITIES, RASeries, SalesSeries
+
+BENCHMARKS = []
+CHECKS = []
+SALES_FILTERS = {"Month": [1, 2, 3], "City": ["Boston (MA)", "Austin (TX)"]}
+RA_FILTERS = {"statut": ["SUCCESS"], "country": ["BF", "CI"]}
+
+
+def bench(name, max_scale=None):
+    # max_scale : au-delà, le benchmark est ignoré (algorithmes quadratiques)
+    def register(func):
+        BENCHMARKS.append((name, func, max_scale))
+        return func
+    return register
+
+
+class Fixtures:
+    """Jeux de données synthétiques d'une échelle donnée, générés à la demande."""
+
+    def __init__(self, scale):
+        self.scale = scale
+
+    @cached_property
+    def sales(self):
+        return synthetic.sales_frame(self.scale)
+
+    @cached_property
+    def sales_zip(self):
+        return synthetic.sales_zip(self.sales)
+
+    @cached_property
+    def cust(self):
+        return analytics.customer_table(self.sales)
+
+    @cached_property
+    def X(self):
+        return analytics.scale_features(self.cust)
+
+    @cached_property
+    def clustered(self):
+        cust = self.cust.copy()
+        cust["Cluster"] = segmentation.fit_segments(self.X, 4)
+        return cust
+
+    @cached_property
+    def sales_cube(self):
+        return SalesCube(self.sales_cities)
+
+    @cached_property
+    def sales_cities(self):
+        return ingestion.add_address_columns(self.sales.copy())
+
+    @cached_property
+    def city_index(self):
+        return ingestion.InvertedIndex(self.sales_cities["City"])
+
+    @cached_property
+    def sales_series(self):
+        return SalesSeries(self.sales_cities)
+
+    @cached_property
+    def ra_series(self):
+        return RASeries(self.ra)
+
+    @cached_property
+    def ra_cube(self):
+        return RACube(self.ra)
+
+    @cached_property
+    def ra_raw(self):
+        return synthetic.ra_frame(self.scale)
+
+    @cached_property
+    def ra_csv(self):
+        return synthetic.ra_csv(self.ra_raw)
+
+    @cached_property
+    def ra(self):
+        return ingestion.clean_ra(self.ra_raw.copy())
+
+    @cached_property
+    def ra_counterpart(self):
+        return synthetic.ra_counterpart(self.ra)
+
+
+# --- Ingestion ---
+@bench("sales.load_zip")
+def _(f):
+    ingestion.load_sales_zip(f.sales_zip)
+
+
+@bench("sales.load_and_clean_zip")
+def _(f):
+    ingestion.clean_sales(ingestion.load_sales_zip(f.sales_zip))
+
+
+@bench("ra.read_and_clean_csv")
+def _(f):
+    ingestion.read_ra_csv(io.BytesIO(f.ra_csv))
+
+
+# --- Dashboard Ventes ---
+@bench("sales.kpis")
+def _(f):
+    analytics.sales_kpis(f.sales)
+
+
+@bench("sales.monthly_and_product")
+def _(f):
+    analytics.monthly_sales(f.sales)
+    analytics.product_sales(f.sales)
+
+
+@bench("sales.basket_top_pairs")
+def _(f):
+    analytics.top_product_combinations(f.sales, size=2)
+
+
+@bench("sales.basket_top_triples")
+def _(f):
+    analytics.top_product_combinations(f.sales, size=3)
+
+
+@bench("sales.city_filter")
+def _(f):
+    f.sales.iloc[f.city_index.rows(["Boston (MA)", "Austin (TX)"])]
+
+
+# --- Segmentation Clients ---
+@bench("segments.customer_table")
+def _(f):
+    analytics.customer_table(f.sales)
+
+
+@bench("segments.features_merge")
+def _(f):
+    # Historique incrémental : deux moitiés agrégées puis fusionnées
+    half = f.sales["Month"] <= 6
+    CustomerFeatures(f.sales[half]).merge(CustomerFeatures(f.sales[~half])).table()
+
+
+@bench("segments.fit_kmeans")
+def _(f):
+    segmentation._memo.clear()
+    segmentation.fit_segments(f.X, 4)
+
+
+@bench("segments.silhouette_sweep")
+def _(f):
+    segmentation._memo.clear()  # mesure d'un ajustement à froid
+    segmentation.silhouette_sweep(f.X)
+
+
+@bench("segments.top_products")
+def _(f):
+    analytics.segment_top_products(f.sales, f.clustered)
+
+
+@bench("segments.pca")
+def _(f):
+    analytics.pca_projection(f.X)
+
+
+# --- Vision 360 ---
+@bench("vision360.all")
+def _(f):
+    analytics.financial_kpis(f.sales["Sales"].sum())
+    analytics.monthly_financials(analytics.monthly_sales(f.sales))
+    analytics.weekday_sales(f.sales)
+
+
+@bench("timeseries.build")
+def _(f):
+    SalesSeries(f.sales_cities)
+    RASeries(f.ra)
+
+
+@bench("timeseries.trends")
+def _(f):
+    # Changement de granularité : lecture des cuboïdes, aucun regroupement des lignes
+    for granularity in GRANULARITIES:
+        f.sales_series.trend(granularity, "Sales", filters={"Month": [1, 2, 3]})
+        f.ra_series.trend(granularity, "transactions", "provider_name", {"statut": ["SUCCESS"]})
+
+
+# --- Reporting RA ---
+@bench("cube.sales_build")
+def _(f):
+    SalesCube(f.sales_cities)
+
+
+@bench("cube.sales_queries")
+def _(f):
+    filters = {"Month": [1, 2, 3], "City": ["Boston (MA)", "Austin (TX)"]}
+    f.sales_cube.kpis(filters)
+    for dim, measure in (("Month", "Sales"), ("Product", "Quantity Ordered"), ("Weekday", "Sales")):
+        f.sales_cube.rollup([dim], [measure], filters)
+
+
+@bench("cube.ra_queries")
+def _(f):
+    filters = {"statut": ["SUCCESS"], "country": ["BF", "CI"]}
+    f.ra_cube.kpis(filters)
+    for dim in ("provider_name", "country", "statut"):
+        f.ra_cube.rollup([dim], ["amount"], filters)
+
+
+@bench("ra.kpis_and_breakdowns")
+def _(f):
+    payin, payout = analytics.split_payin_payout(f.ra)
+    analytics.ra_kpis(f.ra, payin, payout)
+    for col in ("provider_name", "country", "statut"):
+        analytics.amount_by(f.ra, col)
+
+
+@bench("ra.reconcile")
+def _(f):
+    reconcile.reconciliation_summary(reconcile.reconcile(f.ra, f.ra_counterpart, window=pd.Timedelta(minutes=5)))
+
+
+@bench("ra.anomalies")
+def _(f):
+    # Extraction synthétique sans marchand : rafales par provider
+    anomalies.detect_anomalies(f.ra, source="provider_name")
+
+
+# --- Équivalence avec le calcul pandas direct ---
+def check(name):
+    # Chaque vérification renvoie la liste des écarts constatés (vide si tout concorde)
+    def register(func):
+        CHECKS.append((name, func))
+        return func
+    return register
+
+
+def _filtered(data, filters):
+    mask = pd.Series(True, index=data.index)
+    for col, values in filters.items():
+        mask &= data[col].isin(values)
+    return data[mask]
+
+
+def _sales_reference(f):
+    return analytics.sales_kpis(_filtered(f.sales_cities, SALES_FILTERS))
+
+
+def _ra_reference(f, data=None):
+    data = _filtered(f.ra if data is None else data, RA_FILTERS)
+    return {"montant_total": data["amount"].sum(), "nombre_transaction": data["transaction_id"].count()}
+
+
+def _by_month(f):
+    # Mois pairs et impairs : les filtres portent sur les deux moitiés
+    odd = f.sales_cities["Month"] % 2 == 1
+    return f.sales_cities[odd], f.sales_cities[~odd]
+
+
+@check("cube.sales")
+def _(f):
+    monthly = analytics.monthly_sales(f.sales_cities).set_index("Month")["Sales"]
+    rolled = f.sales_cube.rollup(["Month"], ["Sales"]).set_index("Month")["Sales"]
+    return (compare_kpis(_sales_reference(f), f.sales_cube.kpis(SALES_FILTERS))
+            + [f"mois {m}" for m in compare_kpis(monthly.to_dict(), rolled.to_dict())])
+
+
+@check("cube.sales_merge")
+def _(f):
+    first, second = _by_month(f)
+    return compare_kpis(_sales_reference(f), SalesCube(first).merge(SalesCube(second)).kpis(SALES_FILTERS))
+
+
+@check("cube.ra")
+def _(f):
+    return compare_kpis(_ra_reference(f), f.ra_cube.kpis(RA_FILTERS))
+
+
+@check("features.merge")
+def _(f):
+    first, second = _by_month(f)
+    merged = CustomerFeatures(first).merge(CustomerFeatures(second)).table().set_index("Purchase Address")
+    direct = CustomerFeatures(f.sales_cities).table().set_index("Purchase Address").reindex(merged.index)
+    diffs = []
+    for col in direct.columns:
+        try:
+            pd.testing.assert_series_equal(merged[col], direct[col], check_dtype=False, check_categorical=False)
+        except AssertionError:
+            diffs.append(col)
+    return diffs
+
+
+@check("store.sales")
+def _(f):
+    first, second = _by_month(f)
+    with tempfile.TemporaryDirectory() as directory:
+        store = SalesStore("ventes", directory)
+        store.append(synthetic.sales_zip(first), "premier.zip")
+        store.append(synthetic.sales_zip(second), "second.zip")
+        return compare_kpis(_sales_reference(f), store.cube.kpis(SALES_FILTERS))
+
+
+@check("store.ra")
+def _(f):
+    # Deux extractions qui se recouvrent : les doublons de la seconde sont ignorés
+    half = len(f.ra_raw) // 2
+    with tempfile.TemporaryDirectory() as directory:
+        store = RAStore("ra", directory)
+        store.append(synthetic.ra_csv(f.ra_raw.iloc[:half + 1000]), "premier.csv")
+        store.append(synthetic.ra_csv(f.ra_raw.iloc[half:]), "second.csv")
+        return compare_kpis(_ra_reference(f), store.cube.kpis(RA_FILTERS))
+
+
+@check("ra.streaming")
+def _(f):
+    chunksize = max(1, len(f.ra_raw) // 7)
+    cube, _ = stream_ra_cube(io.BytesIO(f.ra_csv), chunksize=chunksize, dedupe="exact")
+    diffs = compare_kpis(_ra_reference(f), cube.kpis(RA_FILTERS))
+    # Filtre de Bloom : des transactions peuvent être prises à tort pour des doublons, jamais l'inverse
+    bloom, stats = stream_ra_cube(io.BytesIO(f.ra_csv), chunksize=chunksize, dedupe="bloom")
+    lost = len(f.ra) - bloom.kpis()["nombre_transaction"]
+    if lost < 0 or lost > max(10, 10 * BLOOM_ERROR_RATE * stats["lignes"]):
+        diffs.append(f"bloom : {lost} transactions perdues")
+    return diffs
+
+
+@check("duckdb")
+def _(f):
+    if not SQL_AVAILABLE:
+        return []
+    diffs = [f"ventes {k}" for k in compare_kpis(_sales_reference(f), DuckDBSales(f.sales_cities).kpis(SALES_FILTERS))]
+    diffs += [f"ra {k}" for k in compare_kpis(_ra_reference(f), DuckDBRA(f.ra).kpis(RA_FILTERS))]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ra.csv")
+        with open(path, "wb") as fh:
+            fh.write(f.ra_csv)
+        diffs += [f"ra csv {k}" for k in compare_kpis(_ra_reference(f), DuckDBRA(path=path).kpis(RA_FILTERS))]
+    return diffs
+
+
+@check("ra.reconcile")
+def _(f):
+    # Référence : jointure pandas sur les identifiants présents des deux côtés
+    left, right = f.ra, f.ra_counterpart
+    pairs = left.dropna(subset="transaction_id").merge(right.dropna(subset="transaction_id"), on="transaction_id")
+    equal = int((pairs["amount_x"] == pairs["amount_y"]).sum())
+    expected = {
+        reconcile.MATCHED: equal,
+        reconcile.MISMATCHED: len(pairs) - equal,
+        reconcile.LEFT_ONLY: len(left) - len(pairs),
+        reconcile.RIGHT_ONLY: len(right) - len(pairs),
+    }
+    counts = reconcile.reconcile(left, right)["statut_rapprochement"].value_counts()
+    return compare_kpis(expected, counts.to_dict())
+
+
+@check("ra.anomalies")
+def _(f):
+    # L'état EWMA repris d'un bloc à l'autre donne le même résultat qu'une passe unique ;
+    # seuil bas : assez de lignes signalées pour comparer les scores
+    params = {"source": "provider_name", "threshold": 1.0}
+    whole_rows, whole_windows = anomalies.detect_anomalies(f.ra, chunksize=len(f.ra), **params)
+    rows, windows = anomalies.detect_anomalies(f.ra, chunksize=max(1, len(f.ra) // 7), **params)
+    diffs = compare_kpis(whole_rows["anomalie"].value_counts().to_dict(), rows["anomalie"].value_counts().to_dict())
+    diffs += [f"tranches {k}" for k in compare_kpis(whole_windows["anomalie"].value_counts().to_dict(),
+                                                     windows["anomalie"].value_counts().to_dict())]
+    # Lignes regroupées par bloc puis par motif : comparées dans le même ordre
+    order = ["anomalie", "created_at", "transaction_id"]
+    rows, whole_rows = rows.sort_values(order, kind="stable"), whole_rows.sort_values(order, kind="stable")
+    if len(rows) == len(whole_rows) and not np.allclose(rows["score"], whole_rows["score"], equal_nan=True):
+        diffs.append("scores")
+    return diffs
+
+
+def verify(scale, pattern=None):
+    """Écarts de chaque vérification, par nom ; affichés au fil de l'eau."""
+    fixtures = Fixtures(scale)
+    failures = {}
+    for name, func in CHECKS:
+        if pattern and pattern not in name:
+            continue
+        diffs = func(fixtures)
+        print(f"{name:<32} x{scale:<4} {'ÉCART : ' + ', '.join(map(str, diffs)) if diffs else 'concorde'}", flush=True)
+        if diffs:
+            failures[name] = diffs
+    return failures
+
+
+def run(scales, pattern=None, repeat=3):
+    results = []
+    for scale in scales:
+        fixtures = Fixtures(scale)
+        for name, func, max_scale in BENCHMARKS:
+            if pattern and pattern not in name:
+                continue
+            if max_scale is not None and scale > max_scale:
+                continue
+            func(fixtures)  # échauffement + génération des fixtures hors chronométrage
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func(fixtures)
+                timings.append(time.perf_counter() - start)
+            result = {"name": name, "scale": scale, "median_s": statistics.median(timings), "min_s": min(timings)}
+            results.append(result)
+            print(f"{name:<32} x{scale:<4} median {result['median_s']:9.4f}s  min {result['min_s']:9.4f}s", flush=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100])
+    parser.add_argument("-k", dest="pattern", help="ne lancer que les benchmarks dont le nom contient ce motif")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="fichier de sortie des résultats")
+    parser.add_argument("--no-check", action="store_true", help="ne pas vérifier l'équivalence avec pandas")
+    args = parser.parse_args(argv)
+    if not args.no_check and verify(min(args.scales) if min(args.scales) % 1 else int(min(args.scales)), args.pattern):
+        sys.exit("Résultats divergents : mesures annulées.")
+    results = run([s if s % 1 else int(s) for s in args.scales], args.pattern, args.repeat)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
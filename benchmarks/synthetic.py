@@ -0,0 +1,120 @@
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+# Générateurs de données synthétiques calibrés sur les fichiers d'exemple du dépôt :
+# l'échelle 1 correspond à la taille du ZIP de ventes (~186 000 lignes sur 12 mois).
+BASE_SALES_ROWS = 186_000
+BASE_RA_ROWS = 186_000
+
+PRODUCTS = {
+    "20in Monitor": 109.99, "27in 4K Gaming Monitor": 389.99, "27in FHD Monitor": 149.99,
+    "34in Ultrawide Monitor": 379.99, "AA Batteries (4-pack)": 3.84, "AAA Batteries (4-pack)": 2.99,
+    "Apple Airpods Headphones": 150.0, "Bose SoundSport Headphones": 99.99, "Flatscreen TV": 300.0,
+    "Google Phone": 600.0, "LG Dryer": 600.0, "LG Washing Machine": 600.0,
+    "Lightning Charging Cable": 14.95, "Macbook Pro Laptop": 1700.0, "ThinkPad Laptop": 999.99,
+    "USB-C Charging Cable": 11.95, "Vareebadd Phone": 400.0, "Wired Headphones": 11.99, "iPhone": 700.0,
+}
+CITIES = [
+    ("San Francisco", "CA 94016"), ("Los Angeles", "CA 90001"), ("New York City", "NY 10001"),
+    ("Boston", "MA 02215"), ("Atlanta", "GA 30301"), ("Dallas", "TX 75001"),
+    ("Seattle", "WA 98101"), ("Portland", "OR 97035"), ("Austin", "TX 73301"),
+]
+STREETS = ["Main", "Park", "Oak", "Pine", "Maple", "Cedar", "Elm", "View", "Washington", "Lake", "Hill", "Walnut"]
+
+RA_STATUTS = ["SUCCESS", "FAILED", "PENDING", "INITIATED"]
+RA_OPERATIONS = ["payment", "transfer"]
+RA_COUNTRIES = ["BF", "CI", "SN", "ML", "CM"]
+RA_PROVIDERS = ["OMBF_Payout", "OMBF_Payin", "MOOV_BF", "WAVE_SN", "MTN_CI", "OM_ML", "ORANGE_CM"]
+
+
+def _addresses(n, rng):
+    nums = rng.integers(1, 1000, n)
+    streets = rng.integers(0, len(STREETS), n)
+    cities = rng.choice(len(CITIES), n, p=[0.24, 0.16, 0.13, 0.11, 0.08, 0.08, 0.08, 0.07, 0.05])
+    return np.array([
+        f"{num} {STREETS[s]} St, {CITIES[c][0]}, {CITIES[c][1]}"
+        for num, s, c in zip(nums, streets, cities)
+    ], dtype=object)
+
+
+def sales_frame(scale=1, seed=0):
+    """Ventes nettoyées (même schéma que ingestion.clean_sales)."""
+    rng = np.random.default_rng(seed)
+    n = int(BASE_SALES_ROWS * scale)
+    # ~8% des commandes contiennent plusieurs produits, comme dans l'échantillon
+    n_orders = int(n / 1.08)
+    order_idx = np.sort(np.concatenate([np.arange(n_orders), rng.integers(0, n_orders, n - n_orders)]))
+    addresses = _addresses(max(1, int(n * 0.75)), rng)
+    order_addr = rng.integers(0, len(addresses), n_orders)
+    order_ts = pd.Timestamp("2019-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, n_orders), unit="min")
+
+    names = np.array(list(PRODUCTS), dtype=object)
+    prices = np.array(list(PRODUCTS.values()))
+    prod = rng.integers(0, len(names), n)
+    df = pd.DataFrame({
+        "Order ID": 141234 + order_idx,
+        "Product": names[prod],
+        "Quantity Ordered": rng.choice([1, 1, 1, 1, 1, 1, 2, 3], n),
+        "Price Each": prices[prod],
+        "Order Date": order_ts[order_idx],
+        "Purchase Address": addresses[order_addr[order_idx]],
+    })
+    df["Month"] = df["Order Date"].dt.month
+    df["Hour"] = df["Order Date"].dt.hour
+    df["Sales"] = df["Quantity Ordered"] * df["Price Each"]
+    return df
+
+
+def sales_zip(df):
+    """Archive ZIP d'un CSV par mois, au format des exports bruts (en-têtes répétés compris)."""
+    buf = io.BytesIO()
+    raw = df.drop(columns=["Month", "Hour", "Sales"])
+    raw = raw.assign(**{"Order Date": raw["Order Date"].dt.strftime("%m/%d/%y %H:%M")})
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for month, part in raw.groupby(df["Month"]):
+            csv = part.to_csv(index=False)
+            header = csv.split("\n", 1)[0]
+            # Les exports contiennent des lignes vides et des en-têtes dupliqués
+            csv += ",,,,,\n" + header + "\n"
+            z.writestr(f"donnees_ventes/Sales_{month:02d}_2019.csv", csv)
+    return buf.getvalue()
+
+
+def ra_frame(scale=1, seed=0):
+    """Extraction RA brute (même colonnes que les fichiers opérateurs)."""
+    rng = np.random.default_rng(seed)
+    n = int(BASE_RA_ROWS * scale)
+    created = pd.Timestamp("2025-03-01") + pd.to_timedelta(rng.integers(0, 31 * 86400, n), unit="s")
+    ids = np.array([f"tx-{i:012d}" for i in range(n)], dtype=object)
+    # Quelques doublons de transaction_id, comme dans les extractions réelles
+    dup = rng.random(n) < 0.01
+    ids[dup] = ids[rng.integers(0, n, dup.sum())]
+    return pd.DataFrame({
+        "created_at": pd.Series(created).dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "transaction_id": ids,
+        "amount": rng.choice([500, 1000, 2500, 5000, 10000, 15000, 40000], n).astype("float64"),
+        "operation_origin": rng.choice(RA_OPERATIONS, n),
+        "statut": rng.choice(RA_STATUTS, n, p=[0.85, 0.1, 0.03, 0.02]),
+        "country": rng.choice(RA_COUNTRIES, n),
+        "provider_name": rng.choice(RA_PROVIDERS, n),
+    })
+
+
+def ra_csv(df):
+    return df.to_csv(index=False).encode("ISO-8859-1")
+
+
+def ra_counterpart(df, seed=1):
+    """Extraction provider de la même période : quelques absences, écarts de montant et identifiants manquants."""
+    rng = np.random.default_rng(seed)
+    out = df[rng.random(len(df)) > 0.01].reset_index(drop=True)
+    changed = rng.random(len(out)) < 0.01
+    out.loc[changed, "amount"] += 100
+    # Identifiant absent côté provider : rapprochement sur montant et horodatage décalé
+    unkeyed = rng.random(len(out)) < 0.01
+    out.loc[unkeyed, "transaction_id"] = None
+    out.loc[unkeyed, "created_at"] += pd.to_timedelta(rng.integers(0, 120, unkeyed.sum()), unit="s")
+    return out
@@ -0,0 +1,264 @@
+import functools
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow absent : le cache disque est simplement désactivé
+    feather = None
+
+# --- Paramètres du cache disque ---
+CACHE_DIR = os.environ.get("REPORTING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "reporting_streamlit"))
+CACHE_MAX_BYTES = int(os.environ.get("REPORTING_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+# À incrémenter à chaque changement du nettoyage pour invalider les anciennes entrées
+CACHE_VERSION = "v4"
+
+# --- Paramètres du cache de résultats partagé ---
+RESULT_MAX_BYTES = int(os.environ.get("REPORTING_RESULT_MAX_BYTES", 1024 ** 3))
+RESULT_MEMORY_BYTES = int(os.environ.get("REPORTING_RESULT_MEMORY_BYTES", 256 * 1024 ** 2))
+RESULT_TTL = float(os.environ.get("REPORTING_RESULT_TTL", 24 * 3600))
+
+_BLOCK_BYTES = 8 * 1024 * 1024
+
+
+def content_digest(raw):
+    """Empreinte d'un fichier chargé, calculée sur tout son contenu."""
+    # Un échantillon (début et fin) ne suffit pas pour un CSV : une correction de même
+    # longueur au milieu du fichier donnerait la même clé et les anciens chiffres.
+    # blake2b hache plusieurs centaines de Mo/s, négligeable face à la lecture pandas.
+    h = hashlib.blake2b(digest_size=16)
+    h.update(len(raw).to_bytes(8, "little"))
+    h.update(raw)
+    return h.hexdigest()
+
+
+def file_digest(path):
+    """Empreinte d'un fichier sur disque, lu par blocs (sans le charger en mémoire)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(os.path.getsize(path).to_bytes(8, "little"))
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(_BLOCK_BYTES), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class FrameCache:
+    """Cache disque de DataFrames nettoyés au format Arrow (Feather v2), avec éviction LRU."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self):
+        return feather is not None and self.max_bytes > 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}-{CACHE_VERSION}.arrow")
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            # Fichier non compressé + memory map : lecture quasi instantanée
+            table = feather.read_table(path, memory_map=True)
+            os.utime(path)  # marque l'entrée comme récemment utilisée
+        except (FileNotFoundError, OSError):
+            return None
+        return table.to_pandas()
+
+    def put(self, key, df):
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Écriture atomique : un autre processus ne lit jamais un fichier partiel
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            feather.write_feather(df.reset_index(drop=True), tmp, compression="uncompressed")
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, self._path(key))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".arrow"):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        # Suppression des entrées les moins récemment utilisées jusqu'à respecter le budget
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class ResultCache:
+    """Cache de résultats partagé entre sessions et processus : mémoire locale puis SQLite.
+
+    Les valeurs (agrégats, étiquettes de clusters, figures sérialisées...) sont stockées
+    picklées : chaque lecture renvoie une copie, comme st.cache_data. Les deux niveaux ont
+    un budget en octets, une éviction LRU et une durée de vie (TTL).
+    """
+
+    def __init__(self, path=None, max_bytes=RESULT_MAX_BYTES, memory_bytes=RESULT_MEMORY_BYTES, ttl=RESULT_TTL):
+        self.path = path or os.path.join(CACHE_DIR, f"results-{CACHE_VERSION}.sqlite")
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()  # clé -> (date d'écriture, octets)
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        # Incréments pas encore reportés dans la table partagée `counters`
+        self._pending = dict.fromkeys(self.counters, 0)
+
+    # --- Niveau disque (SQLite) ---
+    def _db(self):
+        # Une connexion par thread ; WAL : lectures concurrentes pendant une écriture
+        con = getattr(self._local, "con", None)
+        if con is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute("""CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY, value BLOB, size INTEGER, created REAL, accessed REAL)""")
+            con.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+            self._local.con = con
+        return con
+
+    def _count(self, name):
+        # Compteurs en mémoire : une lecture n'ouvre pas de transaction d'écriture
+        with self._lock:
+            self.counters[name] += 1
+            self._pending[name] += 1
+
+    def _flush_counters(self, con):
+        # Reporté lors des écritures (put, lecture disque) et de stats()
+        with self._lock:
+            pending = [(name, n) for name, n in self._pending.items() if n]
+            self._pending = dict.fromkeys(self.counters, 0)
+        if pending:
+            con.executemany("""INSERT INTO counters VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET value = value + excluded.value""", pending)
+
+    # --- Niveau mémoire ---
+    def _remember(self, key, created, blob):
+        if len(blob) > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= len(old[1])
+            self._memory[key] = (created, blob)
+            self._memory_size += len(blob)
+            while self._memory_size > self.memory_bytes:
+                _, (_, evicted) = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                blob = entry[1]
+            else:
+                blob = None
+        if blob is not None:
+            self._count("memory_hits")
+            return pickle.loads(blob)
+        if self.max_bytes > 0:
+            row = self._db().execute("SELECT value, created FROM results WHERE key = ? AND created >= ?",
+                                     (key, now - self.ttl)).fetchone()
+            if row is not None:
+                self._db().execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                self._remember(key, row[1], row[0])
+                self._count("disk_hits")
+                self._flush_counters(self._db())
+                return pickle.loads(row[0])
+        self._count("misses")
+        return default
+
+    def put(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        self._remember(key, now, blob)
+        if self.max_bytes <= 0 or len(blob) > self.max_bytes:
+            return
+        con = self._db()
+        con.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", (key, blob, len(blob), now, now))
+        self._flush_counters(con)
+        self._evict(con, now)
+
+    def _evict(self, con, now):
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            con.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+            total = con.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                # Suppression des entrées les moins récemment lues jusqu'à respecter le budget
+                for key, size in con.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    con.execute("DELETE FROM results WHERE key = ?", (key,))
+                    total -= size
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    def memoize(self, func):
+        """Décorateur : résultat mis en cache selon les arguments, hors arguments préfixés par « _ »."""
+        code = func.__code__
+        names = code.co_varnames[:code.co_argcount]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = dict(zip(names, args), **kwargs)
+            hashed = sorted((k, v) for k, v in bound.items() if not k.startswith("_"))
+            h = hashlib.blake2b(digest_size=16)
+            h.update(f"{func.__module__}.{func.__qualname__}".encode())
+            h.update(pickle.dumps(hashed, protocol=pickle.HIGHEST_PROTOCOL))
+            key = h.hexdigest()
+            missing = object()
+            value = self.get(key, missing)
+            if value is missing:
+                value = func(*args, **kwargs)
+                self.put(key, value)
+            return value
+
+        return wrapper
+
+    def stats(self):
+        """Compteurs du processus et du cache partagé, taille de chaque niveau."""
+        with self._lock:
+            stats = {"processus": dict(self.counters), "memoire": {"entrees": len(self._memory), "octets": self._memory_size}}
+        if self.max_bytes > 0:
+            con = self._db()
+            self._flush_counters(con)
+            stats["partage"] = dict(con.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = con.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            stats["disque"] = {"entrees": entries, "octets": size}
+        return stats
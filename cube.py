@@ -0,0 +1,188 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+# --- Cubes pré-agrégés pour les filtres de la barre latérale ---
+# Chaque cube matérialise quelques cuboïdes (agrégats sur un sous-ensemble de dimensions) ;
+# une requête est servie par le plus petit cuboïde qui contient les dimensions demandées,
+# sans relire les lignes du dataset.
+
+SALES_CUBOIDS = [("Month", "City", "Product"), ("Month", "City", "Hour", "Weekday")]
+SALES_MEASURES = ["Sales", "Quantity Ordered"]
+RA_DIMENSIONS = ["Date", "statut", "operation_origin", "country", "provider_name"]
+
+
+class Cube:
+    """Agrégats additifs d'un DataFrame sur une liste de cuboïdes."""
+
+    def __init__(self, dims, values, cuboids):
+        # dims : une colonne par dimension ; values : une colonne par mesure additive
+        frame = pd.concat([dims, values], axis=1)
+        self.cuboids = {}
+        for cuboid in cuboids:
+            cells = frame.groupby(list(cuboid), dropna=False, sort=False, observed=True)[list(values.columns)].sum()
+            self.cuboids[tuple(cuboid)] = cells.reset_index()
+
+    def _cells(self, dims, measures):
+        candidates = [
+            cells for cuboid, cells in self.cuboids.items()
+            if set(dims) <= set(cuboid) and set(measures) <= set(cells.columns)
+        ]
+        if not candidates:
+            raise ValueError(f"Aucun cuboïde ne couvre les dimensions {sorted(dims)} et mesures {measures}.")
+        return min(candidates, key=len)
+
+    def _slice(self, dims, measures, filters):
+        cells = self._cells(set(dims) | set(filters), measures)
+        mask = np.ones(len(cells), dtype=bool)
+        for dim, values in filters.items():
+            mask &= cells[dim].isin(values).to_numpy()
+        return cells[mask]
+
+    def rollup(self, by, measures, filters=None):
+        """Agrégat des mesures par les dimensions `by`, restreint aux valeurs de `filters`."""
+        by, measures = list(by), list(measures)
+        cells = self._slice(by, measures, filters or {})
+        return cells.groupby(by, observed=True)[measures].sum().reset_index()
+
+    def total(self, measure, filters=None):
+        return self._slice([], [measure], filters or {})[measure].sum()
+
+    def merge(self, other):
+        """Nouveau cube réunissant les agrégats de deux cubes de mêmes cuboïdes (mesures additives)."""
+        merged = copy.copy(self)
+        merged.cuboids = {}
+        for cuboid, cells in self.cuboids.items():
+            frame = pd.concat([cells, other.cuboids[cuboid]], ignore_index=True)
+            measures = [c for c in frame.columns if c not in cuboid]
+            merged.cuboids[cuboid] = frame.groupby(list(cuboid), dropna=False, sort=False, observed=True)[measures].sum().reset_index()
+        return merged
+
+
+class SalesCube(Cube):
+    """Cube des ventes : mois, ville, produit, heure et jour de la semaine."""
+
+    def __init__(self, data):
+        # Ville lue dans la colonne City de clean_sales ; une adresse n'a qu'une ville
+        addr_codes, addresses = pd.factorize(data["Purchase Address"])
+        city = data["City"].to_numpy(dtype=object)
+        cities = np.empty(len(addresses), dtype=object)
+        cities[addr_codes] = city
+        dims = pd.DataFrame({
+            "Month": data["Month"].to_numpy(),
+            "City": city,
+            "Product": data["Product"].to_numpy(),
+            "Hour": data["Hour"].to_numpy(),
+            "Weekday": data["Order Date"].dt.dayofweek.to_numpy(),
+        })
+        values = data[SALES_MEASURES].reset_index(drop=True)
+        super().__init__(dims, values, SALES_CUBOIDS)
+
+        # Une commande appartient à une seule cellule (date et adresse uniques) : le nombre
+        # de commandes distinctes est donc additif sur le cuboïde sans produit.
+        order_grain = ("Month", "City", "Hour", "Weekday")
+        orders = dims[list(order_grain)].assign(order=data["Order ID"].to_numpy()).drop_duplicates()
+        counts = orders.groupby(list(order_grain), dropna=False, observed=True).size().rename("Orders").reset_index()
+        self.cuboids[order_grain] = self.cuboids[order_grain].merge(counts, on=list(order_grain), how="left")
+
+        # Un client (adresse) n'a qu'une ville mais peut acheter plusieurs mois : on garde pour
+        # chaque client un masque binaire des mois d'achat (comptage distinct exact).
+        self.months = np.sort(data["Month"].unique())
+        if len(self.months) > 64:
+            raise ValueError("Le cube client ne gère pas plus de 64 mois distincts.")
+        month_bit = np.searchsorted(self.months, data["Month"].to_numpy()).astype(np.uint64)
+        self.customer_months = np.zeros(len(addresses), dtype=np.uint64)
+        np.bitwise_or.at(self.customer_months, addr_codes, np.uint64(1) << month_bit)
+        self.customer_city = cities
+        self.addresses = pd.Index(np.asarray(addresses, dtype=object))
+
+    def _month_bits(self, months):
+        # Masques clients réexprimés sur une liste de mois élargie
+        target = np.searchsorted(months, self.months).astype(np.uint64)
+        bits = np.zeros_like(self.customer_months)
+        for bit, pos in enumerate(target):
+            bits |= ((self.customer_months >> np.uint64(bit)) & np.uint64(1)) << pos
+        return bits
+
+    def merge(self, other):
+        """Cube des ventes cumulées ; les Order ID des deux cubes doivent être disjoints."""
+        merged = super().merge(other)
+        merged.months = np.union1d(self.months, other.months)
+        if len(merged.months) > 64:
+            raise ValueError("Le cube client ne gère pas plus de 64 mois distincts.")
+        merged.addresses = self.addresses.append(other.addresses).drop_duplicates()
+        merged.customer_months = np.zeros(len(merged.addresses), dtype=np.uint64)
+        merged.customer_city = np.empty(len(merged.addresses), dtype=object)
+        for cube in (self, other):
+            pos = merged.addresses.get_indexer(cube.addresses)
+            np.bitwise_or.at(merged.customer_months, pos, cube._month_bits(merged.months))
+            merged.customer_city[pos] = cube.customer_city
+        return merged
+
+    def customers(self, filters=None):
+        filters = filters or {}
+        unsupported = set(filters) - {"Month", "City"}
+        if unsupported:
+            raise ValueError(f"Comptage clients impossible par {sorted(unsupported)}.")
+        mask = np.ones(len(self.customer_months), dtype=bool)
+        if "Month" in filters:
+            selected = np.isin(self.months, list(filters["Month"]))
+            bits = np.bitwise_or.reduce(np.uint64(1) << np.flatnonzero(selected).astype(np.uint64), initial=np.uint64(0))
+            mask &= (self.customer_months & bits) != 0
+        if "City" in filters:
+            mask &= np.isin(self.customer_city, list(filters["City"]))
+        return int(mask.sum())
+
+    def kpis(self, filters=None):
+        # Même résultat que analytics.sales_kpis sur les lignes filtrées
+        return {
+            "total_sales": self.total("Sales", filters),
+            "total_orders": int(self.total("Orders", filters)),
+            "total_customers": self.customers(filters),
+        }
+
+
+def merge_ra_cells(frames):
+    """Somme de partiels ra_cells au grain des dimensions du cube."""
+    cells = pd.concat(frames, ignore_index=True)
+    return cells.groupby(RA_DIMENSIONS, dropna=False, sort=False, observed=True)[["amount", "transactions"]].sum().reset_index()
+
+
+def ra_cells(data):
+    """Agrégats RA au grain des dimensions du cube (partiels combinables par addition)."""
+    values = pd.DataFrame({
+        "amount": data["amount"].to_numpy(),
+        "transactions": data["transaction_id"].notna().to_numpy().astype(np.int64),
+    })
+    frame = pd.concat([data[RA_DIMENSIONS].reset_index(drop=True), values], axis=1)
+    return frame.groupby(RA_DIMENSIONS, dropna=False, sort=False, observed=True)[list(values.columns)].sum().reset_index()
+
+
+class RACube(Cube):
+    """Cube RA : date, statut, opération, pays et provider."""
+
+    def __init__(self, data):
+        dims = data[RA_DIMENSIONS].reset_index(drop=True)
+        values = pd.DataFrame({
+            "amount": data["amount"].to_numpy(),
+            "transactions": data["transaction_id"].notna().to_numpy().astype(np.int64),
+        })
+        super().__init__(dims, values, [tuple(RA_DIMENSIONS)])
+
+    @classmethod
+    def from_cells(cls, cells):
+        # Construction à partir d'agrégats déjà calculés (lecture en streaming)
+        cube = cls.__new__(cls)
+        Cube.__init__(cube, cells[RA_DIMENSIONS], cells[["amount", "transactions"]], [tuple(RA_DIMENSIONS)])
+        return cube
+
+    def kpis(self, filters=None):
+        return {
+            "montant_total": self.total("amount", filters),
+            "nombre_transaction": int(self.total("transactions", filters)),
+        }
+
+    def options(self, dim):
+        # Valeurs présentes d'une dimension, pour les filtres de la barre latérale
+        return sorted(self.cuboids[tuple(RA_DIMENSIONS)][dim].dropna().unique())
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# --- Table de caractéristiques clients ---
+# Agrégats par client (adresse) calculés par groupement vectorisé sur les codes d'adresse,
+# puis fusionnables : l'historique incrémental met la table à jour à partir des seules
+# nouvelles commandes. Récence, panier moyen et heure préférée en sont dérivés.
+
+# Variables proposées pour la segmentation (style RFM)
+CUSTOMER_FEATURES = ["Sales", "NbCmd", "Quantity Ordered", "Recence", "PanierMoyen", "ArticlesParCmd", "HeurePreferee"]
+
+
+def derive_features(cust):
+    """Ajoute Recence (jours depuis le dernier achat du jeu), PanierMoyen et ArticlesParCmd."""
+    reference = cust["DernierAchat"].max()
+    cust["Recence"] = (reference - cust["DernierAchat"]) / pd.Timedelta(days=1)
+    cust["PanierMoyen"] = cust["Sales"] / cust["NbCmd"]
+    cust["ArticlesParCmd"] = cust["Quantity Ordered"] / cust["NbCmd"]
+    return cust
+
+
+class CustomerFeatures:
+    """Agrégats additifs par client : CA, commandes, articles, dernier achat et heures d'achat."""
+
+    def __init__(self, data):
+        codes, addresses = pd.factorize(data["Purchase Address"])
+        n = len(addresses)
+        self.addresses = pd.Index(np.asarray(addresses, dtype=object))
+        self.integer_quantity = pd.api.types.is_integer_dtype(data["Quantity Ordered"])
+        self.sales = np.bincount(codes, weights=data["Sales"].to_numpy(np.float64), minlength=n)
+        self.quantity = np.bincount(codes, weights=data["Quantity Ordered"].to_numpy(np.float64), minlength=n)
+        # Une ligne par commande (adresse, Order ID) : fréquence et heures d'achat
+        orders = pd.DataFrame({
+            "client": codes,
+            "order": data["Order ID"].to_numpy(),
+            "hour": data["Hour"].to_numpy(np.int64),
+        }).drop_duplicates(["client", "order"])
+        client = orders["client"].to_numpy()
+        self.orders = np.bincount(client, minlength=n)
+        self.hours = np.bincount(client * 24 + orders["hour"].to_numpy(), minlength=n * 24).reshape(n, 24)
+        self.last_order = pd.Series(data["Order Date"].to_numpy()).groupby(codes).max().reindex(range(n)).to_numpy()
+
+    def merge(self, other):
+        """Table cumulée ; les commandes des deux tables doivent être disjointes."""
+        merged = object.__new__(CustomerFeatures)
+        merged.addresses = self.addresses.append(other.addresses).drop_duplicates()
+        n = len(merged.addresses)
+        merged.integer_quantity = self.integer_quantity and other.integer_quantity
+        merged.sales, merged.quantity = np.zeros(n), np.zeros(n)
+        merged.orders = np.zeros(n, dtype=np.int64)
+        merged.hours = np.zeros((n, 24), dtype=np.int64)
+        merged.last_order = np.full(n, np.datetime64("NaT"), dtype=self.last_order.dtype)
+        for part in (self, other):
+            pos = merged.addresses.get_indexer(part.addresses)
+            merged.sales[pos] += part.sales
+            merged.quantity[pos] += part.quantity
+            merged.orders[pos] += part.orders
+            merged.hours[pos] += part.hours
+            merged.last_order[pos] = np.fmax(merged.last_order[pos], part.last_order)
+        return merged
+
+    def table(self):
+        """Une ligne par client, triée par adresse (même ordre que le groupement pandas)."""
+        cust = pd.DataFrame({
+            "Purchase Address": self.addresses,
+            "Sales": self.sales,
+            "NbCmd": self.orders,
+            "Quantity Ordered": self.quantity.round().astype(np.int64) if self.integer_quantity else self.quantity,
+            "DernierAchat": self.last_order,
+            # Heure la plus fréquente parmi les commandes ; à égalité, la plus matinale
+            "HeurePreferee": self.hours.argmax(axis=1),
+        })
+        cust = cust.sort_values("Purchase Address", ignore_index=True)
+        return derive_features(cust)
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+# --- Construction des figures Plotly côté serveur ---
+# Les données sont agrégées avant le tracé : la taille de la figure envoyée au navigateur
+# dépend du nombre de catégories ou de cellules, plus du nombre de lignes.
+
+# Au-delà de ce nombre de points, un nuage de points est agrégé par cellules
+POINT_BUDGET = int(os.environ.get("REPORTING_POINT_BUDGET", 20_000))
+
+
+def aggregate(data, by, values):
+    """Somme de `values` par `by` : une ligne par catégorie affichée."""
+    by = [by] if isinstance(by, str) else list(by)
+    return data.groupby(by, observed=True, sort=False)[values].sum().reset_index()
+
+
+def pie(data, names, values, **kwargs):
+    """Camembert sur une ligne par part, quelle que soit la granularité de `data`."""
+    parts = aggregate(data, names, values)
+    fig = px.pie(parts, names=names, values=values, **kwargs)
+    fig.update_traces(text=parts[names].astype(str), textposition="inside")
+    return fig
+
+
+def bin_points(data, x, y, color=None, budget=POINT_BUDGET):
+    """Nuage réduit à au plus ~`budget` cellules : centre, effectif et couleur de chaque cellule."""
+    groups = data[color].nunique() if color else 1
+    bins = max(2, int(np.sqrt(budget / max(groups, 1))))
+    cells = pd.DataFrame({
+        x: pd.cut(data[x], bins, labels=False),
+        y: pd.cut(data[y], bins, labels=False),
+    })
+    if color:
+        cells[color] = data[color].to_numpy()
+    keys = list(cells.columns)
+    cells = cells.groupby(keys, observed=True).size().rename("Clients").reset_index()
+    # Indices de cellule ramenés aux coordonnées de leur centre
+    for axis in (x, y):
+        low, high = data[axis].min(), data[axis].max()
+        step = (high - low) / bins if high > low else 1.0
+        cells[axis] = low + (cells[axis] + 0.5) * step
+    return cells
+
+
+def scatter(data, x, y, color=None, budget=POINT_BUDGET, **kwargs):
+    """Nuage de points ; au-delà du budget, une bulle par cellule dont la taille suit l'effectif."""
+    if len(data) <= budget:
+        return px.scatter(data, x=x, y=y, color=color, **kwargs)
+    cells = bin_points(data, x, y, color, budget)
+    title = kwargs.pop("title", None)
+    if title:
+        title = f"{title} ({len(data):,} points agrégés en {len(cells):,} cellules)"
+    fig = px.scatter(cells, x=x, y=y, color=color, size="Clients", size_max=12, title=title,
+                     hover_data={"Clients": True}, **kwargs)
+    fig.update_traces(marker=dict(sizemin=2, line=dict(width=0)))
+    return fig
+
+
+def payload_bytes(fig):
+    """Taille JSON de la figure, telle qu'envoyée au navigateur."""
+    return len(pio.to_json(fig, validate=False))
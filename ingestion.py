@@ -0,0 +1,240 @@
+import io
+import os
+import re
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# --- Schéma des CSV de ventes ---
+# Seules ces colonnes sont utilisées par le dashboard : les autres sont ignorées à la lecture.
+SALES_COLUMNS = ["Order ID", "Product", "Quantity Ordered", "Price Each", "Order Date", "Purchase Address"]
+SALES_DTYPES = {
+    "Order ID": "int64",
+    "Product": str,
+    "Quantity Ordered": "int64",
+    "Price Each": "float64",
+    "Order Date": str,
+    "Purchase Address": str,
+}
+
+# Colonnes texte très répétées, stockées sous forme de catégories (dictionnaire + codes entiers)
+SALES_CATEGORIES = ["Product", "Purchase Address"]
+RA_CATEGORIES = ["statut", "operation_origin", "country", "provider_name", "operator", "merchant_name", "currency"]
+
+# --- Schéma des extractions RA ---
+RA_DTYPES = {
+    "created_at": str,
+    "operator": str,
+    "merchant_name": str,
+    "transaction_id": str,
+    "merchant_transaction_id": str,
+    "external_transaction_id": str,
+    "amount": "float64",
+    "fee_amount": "float64",
+    "merchant_amount": "float64",
+    "operation_origin": str,
+    "currency": str,
+    "statut": str,
+    "country": str,
+    "provider_name": str,
+}
+RA_NUMERIC = ["amount", "fee_amount", "merchant_amount"]
+RA_CHUNKSIZE = 1_000_000
+
+# Lignes parasites des exports mensuels : en-têtes répétés et lignes vides (",,,,,")
+_JUNK_LINES = re.compile(rb"^(?:Order ID,[^\n]*|,*\r?)(?:\n|\Z)", re.MULTILINE)
+
+
+def _strip_junk_lines(raw):
+    # On conserve la première ligne (en-tête réel) et on retire les doublons d'en-tête et les lignes vides
+    header, sep, body = raw.partition(b"\n")
+    return header + sep + _JUNK_LINES.sub(b"", body)
+
+
+def _read_sales_csv(raw):
+    raw = _strip_junk_lines(raw)
+    usecols = lambda c: c in SALES_DTYPES
+    try:
+        return pd.read_csv(io.BytesIO(raw), usecols=usecols, dtype=SALES_DTYPES)
+    except ValueError:
+        # Fichier mal formé (valeurs manquantes ou non numériques) : lecture tolérante puis conversion
+        df = pd.read_csv(io.BytesIO(raw), usecols=usecols, dtype=str)
+        for col in ("Order ID", "Quantity Ordered", "Price Each"):
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+        return df
+
+
+def _read_member(zip_bytes, name):
+    # Une archive par thread : ZipFile ne supporte pas les lectures concurrentes sur le même handle
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as z:
+        return _read_sales_csv(z.read(name))
+
+
+def load_sales_zip(zip_bytes, max_workers=None):
+    """Décompresse et lit en parallèle les CSV de ventes d'une archive ZIP."""
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as z:
+        csv_files = sorted(f for f in z.namelist() if f.endswith(".csv"))
+    if not csv_files:
+        raise ValueError("Aucun fichier CSV trouvé dans l'archive.")
+    workers = max_workers or min(len(csv_files), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        df_list = list(pool.map(lambda name: _read_member(zip_bytes, name), csv_files))
+    return pd.concat(df_list, ignore_index=True)
+
+
+def load_sales_file(raw, name):
+    """Lecture d'un fichier de ventes ajouté seul : un CSV mensuel ou une archive ZIP."""
+    if name.lower().endswith(".zip"):
+        return load_sales_zip(raw)
+    return _read_sales_csv(raw)
+
+
+def clean_sales(df):
+    """Nettoyage des ventes : valeurs manquantes, types, dates et chiffre d'affaires."""
+    df = df.dropna()
+    df["Quantity Ordered"] = pd.to_numeric(df["Quantity Ordered"], errors="coerce")
+    df["Price Each"] = pd.to_numeric(df["Price Each"], errors="coerce")
+    df = df.dropna()
+    df["Order Date"] = pd.to_datetime(df["Order Date"], format="%m/%d/%y %H:%M", errors="coerce")
+    df = df.dropna(subset=["Order Date"])
+    df["Month"] = df["Order Date"].dt.month
+    df["Hour"] = df["Order Date"].dt.hour
+    df["Sales"] = df["Quantity Ordered"] * df["Price Each"]
+    return add_address_columns(df.reset_index(drop=True))
+
+
+# --- Adresses ---
+_ADDRESS = r"^.*, (?P<City>[^,]+), (?P<State>[A-Z]{2}) (?P<Zip>\d{5})$"
+
+
+def parse_addresses(addresses):
+    """Ville « Nom (État) », État et code postal de chaque adresse « rue, ville, ÉT 12345 »."""
+    parts = pd.Series(addresses, dtype=object).astype(str).str.extract(_ADDRESS)
+    # Ville qualifiée par l'État : Portland (OR) et Portland (ME) sont deux villes distinctes
+    parts["City"] = parts["City"] + " (" + parts["State"] + ")"
+    return parts
+
+
+def add_address_columns(df):
+    """Colonnes City, State et Zip (catégories), analysées une seule fois par adresse distincte."""
+    codes, addresses = pd.factorize(df["Purchase Address"])
+    parts = parse_addresses(addresses)
+    for col in ("City", "State", "Zip"):
+        part_codes, categories = pd.factorize(parts[col], sort=True)
+        df[col] = pd.Categorical.from_codes(part_codes[codes], categories=categories)
+    return df
+
+
+class InvertedIndex:
+    """Index inversé valeur -> positions des lignes : la sélection coûte O(lignes retenues)."""
+
+    def __init__(self, column):
+        codes, self.values = pd.factorize(column, sort=True)
+        self.positions = np.argsort(codes, kind="stable")
+        self.offsets = np.searchsorted(codes[self.positions], np.arange(len(self.values) + 1))
+        self._lookup = {value: i for i, value in enumerate(self.values)}
+
+    def rows(self, values):
+        """Positions triées des lignes portant l'une des valeurs demandées."""
+        slices = [
+            self.positions[self.offsets[i]:self.offsets[i + 1]]
+            for i in (self._lookup[v] for v in values if v in self._lookup)
+        ]
+        if not slices:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(slices))
+
+
+# --- Extractions RA ---
+def iter_ra_chunks(source, chunksize, lenient=False):
+    # Montants typés dès la lecture ; en mode tolérant, tout est lu en texte puis converti
+    dtype = {c: (str if lenient else t) for c, t in RA_DTYPES.items()}
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return pd.read_csv(source, encoding="ISO-8859-1", usecols=lambda c: c in RA_DTYPES, dtype=dtype, chunksize=chunksize)
+
+
+def concat_compact(frames):
+    # Catégories unifiées avant concaténation : les colonnes restent catégorielles
+    if len(frames) == 1:
+        return frames[0]
+    for col, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            categories = sorted(set().union(*(f[col].cat.categories for f in frames)))
+            for f in frames:
+                f[col] = f[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def clean_ra(data, dedupe=True):
+    """Nettoyage d'une extraction RA : dates, montants numériques, transactions uniques."""
+    for col in RA_NUMERIC:
+        if col in data.columns and not pd.api.types.is_float_dtype(data[col].dtype):
+            data[col] = pd.to_numeric(data[col], errors="coerce")
+    # Analyse vectorisée de created_at, une seule fois, en vraies dates
+    created = pd.to_datetime(data["created_at"], format="ISO8601", errors="coerce")
+    data["created_at"] = created
+    data["Date"] = created.dt.normalize()
+    data["Hour"] = created.dt.hour
+    if not dedupe:
+        return data
+    # Dédoublonnage par table de hachage sur transaction_id, en une passe
+    return data[~data["transaction_id"].duplicated(keep="first")].reset_index(drop=True)
+
+
+def read_ra_csv(source, chunksize=RA_CHUNKSIZE):
+    """Lecture par blocs d'une extraction RA : chaque bloc est nettoyé et compacté avant assemblage."""
+    for lenient in (False, True):
+        try:
+            frames = [
+                compact_frame(chunk, RA_CATEGORIES)
+                for chunk in iter_ra_chunks(source, chunksize, lenient)
+            ]
+            break
+        except ValueError:
+            # Montant non numérique dans le fichier : relecture tolérante
+            if lenient:
+                raise
+    data = clean_ra(concat_compact(frames))
+    return compact_frame(data, RA_CATEGORIES)
+
+
+# --- Représentation compacte en mémoire ---
+def compact_frame(df, categories):
+    """Texte répété en catégories, entiers réduits au plus petit type sans perte."""
+    for col in categories:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col in df.select_dtypes("integer").columns:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def _object_bytes(categories, codes):
+    # Octets des objets d'une colonne objet : chaque ligne compte la taille de sa valeur
+    sizes = np.array([sys.getsizeof(v) for v in categories.astype(object)] + [sys.getsizeof(np.nan)], dtype=np.int64)
+    counts = np.bincount(np.where(codes < 0, len(categories), codes), minlength=len(sizes))
+    return int(sizes @ counts)
+
+
+def memory_report(df):
+    """Mémoire par colonne : représentation compacte comparée aux types par défaut (objets, int64)."""
+    rows = []
+    for col in df.columns:
+        s = df[col]
+        after = s.memory_usage(deep=True, index=False)
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            # Taille en objets déduite des catégories et des codes, sans développer la colonne
+            before = len(s) * 8 + _object_bytes(s.cat.categories, s.cat.codes.to_numpy())
+        elif pd.api.types.is_integer_dtype(s.dtype):
+            before = len(s) * 8
+        else:
+            before = after
+        rows.append((col, str(s.dtype), before / 1e6, after / 1e6))
+    report = pd.DataFrame(rows, columns=["Colonne", "Type", "Avant (Mo)", "Après (Mo)"])
+    total = pd.DataFrame([("Total", "", report["Avant (Mo)"].sum(), report["Après (Mo)"].sum())], columns=report.columns)
+    return pd.concat([report, total], ignore_index=True).round(2)
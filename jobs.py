@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# --- Précalculs en arrière-plan ---
+# Dès qu'un fichier arrive, ses étapes (lecture, cube, paniers, silhouette...) s'exécutent
+# dans un pool de threads partagé par les sessions. Chaque résultat est disponible dès la fin
+# de son étape : le script Streamlit n'attend que ce qu'il affiche, et un clic sur un widget
+# relance le script sans relancer les calculs. Un job n'est annulé que lorsque plus aucune
+# session ne l'utilise (nouveau fichier chargé) ; l'annulation prend effet entre deux étapes.
+
+JOB_WORKERS = int(os.environ.get("REPORTING_JOB_WORKERS", 2))
+# Jobs terminés conservés (leurs résultats restent en mémoire)
+JOB_KEEP = int(os.environ.get("REPORTING_JOB_KEEP", 4))
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "en attente", "en cours", "terminée", "erreur", "annulée"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """Suite d'étapes nommées ; chaque étape reçoit les résultats des précédentes."""
+
+    def __init__(self, key, steps):
+        self.key = key
+        self.steps = list(steps)
+        self.results = {}
+        self.records = [{"etape": name, "statut": PENDING, "duree_s": None} for name, _ in self.steps]
+        self.error = None
+        self.owners = set()
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+        self._changed = threading.Condition()
+
+    def run(self):
+        try:
+            for (name, func), record in zip(self.steps, self.records):
+                if self._cancel.is_set():
+                    record["statut"] = CANCELLED
+                    continue
+                record["statut"] = RUNNING
+                start = time.perf_counter()
+                try:
+                    value = func(self.results)
+                except Exception as e:
+                    record["statut"] = FAILED
+                    self.error = e
+                    break
+                finally:
+                    record["duree_s"] = time.perf_counter() - start
+                with self._changed:
+                    self.results[name] = value
+                    record["statut"] = DONE
+                    self._changed.notify_all()
+        finally:
+            self._finished.set()
+            with self._changed:
+                self._changed.notify_all()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def done(self):
+        return self._finished.is_set()
+
+    def ready(self, name):
+        return name in self.results
+
+    def progress(self):
+        """Fraction des étapes terminées et nom de l'étape en cours."""
+        done = sum(r["statut"] == DONE for r in self.records)
+        current = next((r["etape"] for r in self.records if r["statut"] == RUNNING), None)
+        return done / len(self.records), current
+
+    def wait(self, name, timeout=None, on_wait=None):
+        """Résultat de l'étape `name`, en attendant sa fin ; on_wait(job) est appelé pendant l'attente."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while name not in self.results:
+                if self.error is not None:
+                    raise self.error
+                if self.done:
+                    raise JobCancelled(f"Étape « {name} » non exécutée.")
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(name)
+                self._changed.wait(0.2)
+                if on_wait is not None:
+                    on_wait(self)
+            return self.results[name]
+
+    def frame(self):
+        return pd.DataFrame(self.records)
+
+
+class JobRunner:
+    """Pool partagé : un job par clé (empreinte du fichier), réutilisé par toutes les sessions."""
+
+    def __init__(self, max_workers=JOB_WORKERS, keep=JOB_KEEP):
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="precalcul")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.keep = keep
+
+    def submit(self, key, steps, owner):
+        """Job de `key` pour la session `owner` ; l'ancien job de cette session est libéré."""
+        with self._lock:
+            for other in list(self._jobs.values()):
+                if other.key != key and owner in other.owners:
+                    self._release(other, owner)
+            job = self._jobs.get(key)
+            if job is None or job.cancelled or job.error is not None:
+                job = Job(key, steps)
+                self._jobs[key] = job
+                self._pool.submit(job.run)
+            self._jobs.move_to_end(key)
+            job.owners.add(owner)
+            self._evict()
+            return job
+
+    def release(self, owner):
+        """La session ne suit plus aucun job (fichier retiré)."""
+        with self._lock:
+            for job in list(self._jobs.values()):
+                if owner in job.owners:
+                    self._release(job, owner)
+
+    def _release(self, job, owner):
+        job.owners.discard(owner)
+        if not job.owners and not job.done:
+            job.cancel()
+            del self._jobs[job.key]
+
+    def _evict(self):
+        # Au-delà de `keep`, les jobs terminés les moins récemment demandés sont oubliés :
+        # leurs résultats restent dans les caches, un nouveau job les relit sans recalcul
+        finished = [k for k, j in self._jobs.items() if j.done]
+        for key in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[key]
@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# --- Instrumentation des étapes d'une exécution ---
+# Temps écoulé, lignes en entrée/sortie et pic mémoire (tracemalloc) de chaque étape.
+# tracemalloc est global au processus : en multi-sessions, le pic mémoire est approximatif.
+
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0:
+            tracemalloc.stop()
+
+
+class Profiler:
+    """Mesures des étapes d'une exécution ; inactif (aucun coût) si enabled est faux."""
+
+    def __init__(self, enabled=True, memory=True, **meta):
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.meta = meta
+        self.records = []
+        self._stack = []
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Mesure le bloc ; renseigner record["lignes_sortie"] dans le bloc si pertinent."""
+        record = {"etape": name, "lignes_entree": rows_in, "lignes_sortie": None}
+        if not self.enabled:
+            yield record
+            return
+        record["niveau"] = len(self._stack)
+        if self.memory and not self._stack:
+            # Suivi actif seulement pendant les étapes : aucun surcoût entre elles
+            _start_tracing()
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # Le pic de l'étape englobante est relevé avant d'être réinitialisé
+                self._stack[-1]["_peak"] = max(self._stack[-1]["_peak"], peak)
+            record["_start"], record["_peak"] = current, current
+            tracemalloc.reset_peak()
+        self.records.append(record)
+        self._stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["duree_s"] = time.perf_counter() - start
+            self._stack.pop()
+            if self.memory:
+                peak = max(record.pop("_peak"), tracemalloc.get_traced_memory()[1])
+                record["pic_memoire_mo"] = (peak - record.pop("_start")) / 1024 ** 2
+                if self._stack:
+                    self._stack[-1]["_peak"] = max(self._stack[-1]["_peak"], peak)
+                else:
+                    _stop_tracing()
+
+    def frame(self):
+        columns = ["etape", "niveau", "duree_s", "lignes_entree", "lignes_sortie", "pic_memoire_mo"]
+        # Mesures propres à certaines étapes (taille des figures...) en colonnes supplémentaires
+        extra = [k for r in self.records for k in r if k not in columns]
+        return pd.DataFrame(self.records).reindex(columns=columns + list(dict.fromkeys(extra)))
+
+    def to_json(self):
+        return json.dumps({**self.meta, "etapes": self.records}, indent=2, default=str)
+
+    def to_csv(self):
+        frame = self.frame()
+        for key, value in self.meta.items():
+            frame.insert(0, key, str(value))
+        return frame.to_csv(index=False)
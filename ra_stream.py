@@ -0,0 +1,128 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from cube import RACube, merge_ra_cells, ra_cells
+from ingestion import RA_CHUNKSIZE, clean_ra, iter_ra_chunks
+
+# --- Lecture en streaming des extractions RA plus grandes que la mémoire ---
+# Le fichier est lu par blocs ; seuls restent en mémoire l'ensemble des transaction_id
+# déjà vus (empreintes 64 bits) et les agrégats au grain du cube RA.
+
+BLOOM_ERROR_RATE = 1e-4
+# Capacité du filtre : nombre de lignes estimé du fichier, avec une marge
+BLOOM_MARGIN = 1.2
+BLOOM_MIN_CAPACITY = 10_000
+_SAMPLE_BYTES = 1024 * 1024
+
+
+def _hash_ids(ids, key="0123456789123456"):
+    return pd.util.hash_array(ids.astype(str).to_numpy(dtype=object), hash_key=key)
+
+
+class TransactionSet:
+    """Ensemble exact des empreintes 64 bits des transaction_id vus (8 octets par transaction)."""
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def add_new(self, ids):
+        # Renvoie le masque des transactions jamais vues (y compris dans le bloc) et les mémorise
+        h = _hash_ids(ids)
+        fresh = ~pd.Series(h).duplicated().to_numpy()
+        if len(self.hashes):
+            pos = np.minimum(np.searchsorted(self.hashes, h), len(self.hashes) - 1)
+            fresh &= self.hashes[pos] != h
+        new = np.sort(h[fresh])
+        # Fusion de deux suites triées : tri stable quasi linéaire
+        self.hashes = np.sort(np.concatenate([self.hashes, new]), kind="stable")
+        return fresh
+
+    @property
+    def nbytes(self):
+        return self.hashes.nbytes
+
+
+def estimate_rows(source):
+    """Nombre de lignes d'un CSV (chemin ou tampon) estimé d'après la largeur moyenne du premier Mo."""
+    if isinstance(source, (str, os.PathLike)):
+        size = os.path.getsize(source)
+        with open(source, "rb") as fh:
+            sample = fh.read(_SAMPLE_BYTES)
+    elif hasattr(source, "getbuffer"):
+        buffer = source.getbuffer()
+        size, sample = len(buffer), bytes(buffer[:_SAMPLE_BYTES])
+    else:  # flux de taille inconnue : capacité minimale, dépassement signalé
+        return 0
+    lines = max(sample.count(b"\n"), 1)
+    return int(size / (len(sample) / lines)) if sample else 0
+
+
+class BloomFilter:
+    """Filtre de Bloom dimensionné pour `capacity` transactions ; quelques faux positifs possibles."""
+
+    def __init__(self, capacity=BLOOM_MIN_CAPACITY, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.count = 0
+        self.n_bits = int(np.ceil(-capacity * np.log(error_rate) / np.log(2) ** 2))
+        self.n_hashes = max(1, int(round(self.n_bits / capacity * np.log(2))))
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+
+    def add_new(self, ids):
+        h1 = _hash_ids(ids)
+        fresh = ~pd.Series(h1).duplicated().to_numpy()
+        # Double hachage : k positions dérivées de deux empreintes indépendantes
+        h2 = _hash_ids(ids, key="6543210987654321") | np.uint64(1)
+        i = np.arange(self.n_hashes, dtype=np.uint64)
+        positions = (h1[:, None] + i[None, :] * h2[:, None]) % np.uint64(self.n_bits)
+        present = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        fresh &= ~present.all(axis=1)
+        self.count += int(fresh.sum())
+        new = positions[fresh].ravel()
+        np.bitwise_or.at(self.bits, new >> np.uint64(3), (np.uint8(1) << (new & np.uint64(7)).astype(np.uint8)))
+        return fresh
+
+    @property
+    def saturated(self):
+        # Au-delà de la capacité, le taux de faux positifs (transactions écartées à tort) augmente
+        return self.count > self.capacity
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+
+def stream_ra_cube(source, chunksize=RA_CHUNKSIZE, dedupe="exact", progress=None, capacity=None):
+    """Cube RA construit bloc par bloc, sans jamais charger tout le fichier."""
+    if dedupe == "bloom" and capacity is None:
+        capacity = max(BLOOM_MIN_CAPACITY, int(estimate_rows(source) * BLOOM_MARGIN))
+    for lenient in (False, True):
+        seen = BloomFilter(capacity) if dedupe == "bloom" else TransactionSet()
+        partials, cells = [], None
+        stats = {"lignes": 0, "doublons": 0, "blocs": 0}
+        try:
+            for chunk in iter_ra_chunks(source, chunksize, lenient):
+                chunk = clean_ra(chunk, dedupe=False)
+                fresh = seen.add_new(chunk["transaction_id"])
+                stats["lignes"] += len(chunk)
+                stats["doublons"] += int((~fresh).sum())
+                stats["blocs"] += 1
+                partials.append(ra_cells(chunk[fresh]))
+                # Réduction régulière : la taille des agrégats dépend des dimensions, pas du fichier
+                if len(partials) >= 8:
+                    cells = merge_ra_cells(([cells] if cells is not None else []) + partials)
+                    partials = []
+                if progress:
+                    progress(stats)
+            break
+        except ValueError:
+            # Montant non numérique dans le fichier : relecture tolérante
+            if lenient:
+                raise
+    cells = merge_ra_cells(([cells] if cells is not None else []) + partials)
+    stats["memoire_dedoublonnage"] = seen.nbytes
+    if dedupe == "bloom":
+        stats["capacite_bloom"] = seen.capacity
+        stats["bloom_sature"] = seen.saturated
+    return RACube.from_cells(cells), stats
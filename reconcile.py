@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+# --- Rapprochement des transactions ---
+# Deux jeux de transactions (payin et payout d'une extraction, ou deux extractions provider)
+# sont rapprochés en deux passes :
+# 1. jointure par hachage sur l'identifiant (empreintes 64 bits, identifiants revérifiés), avec
+#    tolérance sur le montant ;
+# 2. optionnelle, lignes restantes : fusion triée sur l'horodatage, même montant, même provider
+#    (et même marchand s'il est connu) dans une fenêtre de temps.
+# Suffixes : _g pour le jeu de référence (gauche), _d pour la contrepartie (droite).
+
+KEYS = ("transaction_id", "external_transaction_id", "merchant_transaction_id")
+MATCHED = "rapprochée"
+MISMATCHED = "écart de montant"
+WINDOW_MATCHED = "rapprochée (fenêtre)"
+LEFT_ONLY = "absente de la contrepartie"
+RIGHT_ONLY = "absente de la référence"
+STATUSES = [MATCHED, WINDOW_MATCHED, MISMATCHED, LEFT_ONLY, RIGHT_ONLY]
+COLUMNS = ["provider_name", "operation_origin", "created_at", "amount"]
+# Seconde passe : une contrepartie n'est cherchée que parmi les lignes de même montant et de mêmes valeurs ici
+WINDOW_BY = ("provider_name", "merchant_name")
+
+
+def _side(data, key):
+    # Colonnes utiles seulement ; identifiants vides ou répétés laissés à la seconde passe
+    side = data[COLUMNS + [c for c in WINDOW_BY if c in data.columns and c not in COLUMNS]].reset_index(drop=True)
+    side["cle"] = data[key].reset_index(drop=True)
+    keyed = np.flatnonzero((side["cle"].notna() & (side["cle"] != "")).to_numpy())
+    # Empreintes 64 bits : jointure sur entiers plutôt que sur chaînes
+    hashes = pd.util.hash_array(side["cle"].iloc[keyed].astype(str).to_numpy(dtype=object), categorize=False)
+    first = ~pd.Series(hashes).duplicated(keep=False).to_numpy()
+    return side, pd.DataFrame({"h": hashes[first], "pos": keyed[first]})
+
+
+def _window_pairs(left, right, rest_g, rest_d, window):
+    # Plus proche contrepartie de même montant (au centime), même provider et même marchand
+    # dans la fenêtre, sur données triées
+    by = ["cents"] + [c for c in WINDOW_BY if c in left.columns and c in right.columns]
+
+    def prepare(side, rest, name):
+        t, amount = side["created_at"].to_numpy()[rest], side["amount"].to_numpy()[rest]
+        ok = ~(pd.isna(t) | np.isnan(amount))
+        frame = pd.DataFrame({"t": t[ok], "cents": np.round(amount[ok] * 100).astype(np.int64), name: rest[ok]})
+        for col in by[1:]:
+            # Chaînes : les catégories des deux extractions diffèrent
+            frame[col] = side[col].iloc[rest[ok]].astype(str).to_numpy()
+        return frame.sort_values("t", kind="stable")
+
+    g, d = prepare(left, rest_g, "pos_g"), prepare(right, rest_d, "pos_d")
+    if g.empty or d.empty:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    pairs = pd.merge_asof(g, d, on="t", by=by, tolerance=window, direction="nearest").dropna(subset=["pos_d"])
+    # Une contrepartie ne sert qu'une fois : les suivantes restent non rapprochées
+    pairs = pairs[~pairs["pos_d"].duplicated()]
+    return pairs["pos_g"].to_numpy(np.int64), pairs["pos_d"].to_numpy(np.int64)
+
+
+def reconcile(left, right, key="transaction_id", amount_tol=0.0, window=None):
+    """Une ligne par transaction rapprochée ou orpheline ; `window` (Timedelta) active la seconde passe."""
+    left_side, left_keys = _side(left, key)
+    right_side, right_keys = _side(right, key)
+
+    # Passe 1 : jointure par hachage sur l'identifiant
+    pairs = left_keys.merge(right_keys, on="h", suffixes=("_g", "_d"))
+    pos_g, pos_d = pairs["pos_g"].to_numpy(), pairs["pos_d"].to_numpy()
+    # Collision d'empreintes : identifiants différents, paire écartée (seconde passe ou orphelines)
+    same = left_side["cle"].iloc[pos_g].astype(str).to_numpy() == right_side["cle"].iloc[pos_d].astype(str).to_numpy()
+    pos_g, pos_d = pos_g[same], pos_d[same]
+    gap = right_side["amount"].to_numpy()[pos_d] - left_side["amount"].to_numpy()[pos_g]
+    status = np.where(np.abs(gap) <= amount_tol, MATCHED, MISMATCHED)
+
+    # Passe 2 (si `window`) : fenêtre de temps sur les lignes sans correspondance d'identifiant
+    rest_g = np.setdiff1d(np.arange(len(left_side)), pos_g, assume_unique=True)
+    rest_d = np.setdiff1d(np.arange(len(right_side)), pos_d, assume_unique=True)
+    win_g, win_d = _window_pairs(left_side, right_side, rest_g, rest_d, window) if window else ([], [])
+    only_g = np.setdiff1d(rest_g, win_g, assume_unique=True)
+    only_d = np.setdiff1d(rest_d, win_d, assume_unique=True)
+
+    missing = lambda n: np.full(n, -1)
+    result = pd.DataFrame({
+        "pos_g": np.concatenate([pos_g, win_g, only_g, missing(len(only_d))]).astype(np.int64),
+        "pos_d": np.concatenate([pos_d, win_d, missing(len(only_g)), only_d]).astype(np.int64),
+        "statut_rapprochement": pd.Categorical(
+            np.concatenate([status, np.full(len(win_g), WINDOW_MATCHED),
+                            np.full(len(only_g), LEFT_ONLY), np.full(len(only_d), RIGHT_ONLY)]),
+            categories=STATUSES),
+    })
+    for suffix, side in (("_g", left_side), ("_d", right_side)):
+        pos = result.pop("pos" + suffix).to_numpy()
+        present = pos >= 0
+        for col in side.columns:
+            if len(side):
+                values = side[col].iloc[np.where(present, pos, 0)].reset_index(drop=True).where(present)
+            else:
+                values = side[col].reindex(pos).reset_index(drop=True)
+            result[col + suffix] = values
+    result["ecart"] = result["amount_d"] - result["amount_g"]
+    # Provider et opération de la référence, à défaut ceux de la contrepartie
+    for col in ("provider_name", "operation_origin"):
+        g, d = result[col + "_g"].astype("category"), result[col + "_d"].astype("category")
+        categories = g.cat.categories.union(d.cat.categories)
+        result[col] = g.cat.set_categories(categories).fillna(d.cat.set_categories(categories))
+    return result
+
+
+def reconciliation_summary(result):
+    """Par provider : nombre de transactions par statut, écarts et montants non rapprochés."""
+    counts = pd.crosstab(result["provider_name"], result["statut_rapprochement"]).reindex(columns=STATUSES, fill_value=0)
+    by_provider = result.groupby("provider_name", observed=True)
+    mismatched = result["statut_rapprochement"] == MISMATCHED
+    amounts = pd.DataFrame({
+        "ecart_montant": result["ecart"].where(mismatched).groupby(result["provider_name"], observed=True).sum(),
+        "montant_absent_contrepartie": result["amount_g"].where(result["statut_rapprochement"] == LEFT_ONLY).groupby(result["provider_name"], observed=True).sum(),
+        "montant_absent_reference": result["amount_d"].where(result["statut_rapprochement"] == RIGHT_ONLY).groupby(result["provider_name"], observed=True).sum(),
+    })
+    summary = counts.join(amounts).fillna(0)
+    summary["taux_rapprochement (%)"] = 100 * summary[[MATCHED, WINDOW_MATCHED]].sum(axis=1) / by_provider.size()
+    summary.columns.name = None
+    return summary.reset_index()
+
+
+def exceptions(result):
+    """Transactions à traiter : écarts de montant et orphelines."""
+    return result[result["statut_rapprochement"].isin([MISMATCHED, LEFT_ONLY, RIGHT_ONLY])]
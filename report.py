@@ -0,0 +1,287 @@
+"""Rapports hors Streamlit : mêmes agrégats et graphiques que les deux dashboards.
+
+Usage (depuis la racine du dépôt) :
+
+    python report.py données_ventes.zip -o rapports/
+    python report.py extractions/ --segments 4 --formats html parquet
+    python report.py ventes/ extractions_ra/ --workers 4
+
+Chaque fichier (ZIP ou CSV de ventes, CSV d'extraction RA) est lu et nettoyé dans un
+processus du pool ; les agrégats sont ensuite calculés une seule fois sur l'ensemble.
+Sorties : tables Parquet, rapport HTML et, si kaleido est installé, figures PNG. Les
+dashboards relisent les tables d'un rapport (source « Rapport précalculé ») lorsque
+REPORTING_REPORTS_DIR désigne le répertoire qui contient les rapports.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from analytics import (
+    top_product_combinations, customer_table, scale_features, segment_summary, segment_top_products,
+    pca_projection, financial_kpis, monthly_financials, name_weekdays, split_payin_payout, ra_kpis, amount_by,
+)
+from cube import SalesCube, ra_cells
+from figures import pie, scatter
+from ingestion import SALES_CATEGORIES, clean_sales, compact_frame, concat_compact, load_sales_file, read_ra_csv
+from segmentation import best_k, fit_segments, silhouette_sweep
+
+FORMATS = ("html", "parquet", "png")
+# Répertoire des rapports proposés par les dashboards (option masquée si non défini)
+REPORTS_DIR = os.environ.get("REPORTING_REPORTS_DIR", "")
+
+
+# --- Découverte et lecture des fichiers ---
+def _kind(path):
+    # Une archive contient des ventes ; un CSV est classé d'après son en-tête
+    if path.lower().endswith(".zip"):
+        return "ventes"
+    with open(path, "rb") as fh:
+        header = fh.readline().decode("ISO-8859-1")
+    if "Order ID" in header:
+        return "ventes"
+    if "transaction_id" in header:
+        return "ra"
+    return None
+
+
+def discover(paths):
+    """Fichiers à traiter, (type, chemin), dans l'ordre des noms."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        else:
+            files.append(path)
+    jobs = []
+    for path in files:
+        if path.lower().endswith((".zip", ".csv")):
+            kind = _kind(path)
+            if kind:
+                jobs.append((kind, path))
+    return jobs
+
+
+def _load(job):
+    # Exécuté dans un processus du pool : lecture, nettoyage et compaction d'un fichier
+    kind, path = job
+    if kind == "ventes":
+        with open(path, "rb") as fh:
+            raw = fh.read()
+        return compact_frame(clean_sales(load_sales_file(raw, path)), SALES_CATEGORIES)
+    return read_ra_csv(path)
+
+
+def _merge_sales(frames):
+    # Une commande déjà vue dans un fichier précédent est ignorée (exports qui se recouvrent)
+    seen, kept = np.empty(0, dtype=np.int64), []
+    for frame in frames:
+        ids = frame["Order ID"].to_numpy().astype(np.int64)
+        fresh = ~np.isin(ids, seen)
+        kept.append(frame[fresh])
+        seen = np.union1d(seen, ids)
+    return concat_compact(kept).reset_index(drop=True)
+
+
+def _merge_ra(frames):
+    data = concat_compact(frames)
+    return data[~data["transaction_id"].duplicated(keep="first")].reset_index(drop=True)
+
+
+# --- Agrégats ---
+def sales_report(data, n_clusters=None, top_n=5):
+    """Tables et figures des onglets Dashboard Ventes, Segmentation Clients et Vision 360."""
+    cube = SalesCube(data)
+    kpis = cube.kpis()
+    monthly = cube.rollup(["Month"], ["Sales"])
+    products = cube.rollup(["Product"], ["Quantity Ordered"])
+    combos = pd.DataFrame(
+        [(size, " & ".join(combo), count)
+         for size in (2, 3) for combo, count in top_product_combinations(data, size=size, top_n=top_n)],
+        columns=["Taille", "Combinaison", "Commandes"],
+    )
+
+    cust = customer_table(data)
+    X = scale_features(cust)
+    # Deux clients ou moins : pas de k candidat, un seul segment
+    n_clusters = n_clusters or best_k(silhouette_sweep(X)) or 1
+    cust["Cluster"] = fit_segments(X, n_clusters)
+    seg_count, seg_sales = segment_summary(cust)
+    top_products = pd.concat(
+        [tops.assign(Cluster=c) for c, tops in segment_top_products(data, cust, top_n=top_n).items()],
+        ignore_index=True,
+    )
+    pca_feats = pca_projection(X)
+    cust["PCA1"], cust["PCA2"] = pca_feats[:, 0], pca_feats[:, 1]
+
+    fin = financial_kpis(kpis["total_sales"])
+    monthly_df = monthly_financials(monthly)
+    day_sales = name_weekdays(cube.rollup(["Weekday"], ["Sales"]))
+
+    tables = {
+        "kpis": pd.DataFrame([{**kpis, **fin, "segments": n_clusters}]),
+        "ventes_par_mois": monthly,
+        "ventes_par_produit": products,
+        "combinaisons_produits": combos,
+        "clients": cust,
+        "clients_par_segment": seg_count,
+        "ca_par_segment": seg_sales,
+        "top_produits_par_segment": top_products,
+        "vision360_mensuel": monthly_df,
+        "ventes_par_jour": day_sales,
+    }
+    return tables, sales_figures(tables)
+
+
+def sales_figures(tables):
+    """Figures du rapport des ventes, construites à partir de ses seules tables."""
+    monthly, products, monthly_df = tables["ventes_par_mois"], tables["ventes_par_produit"], tables["vision360_mensuel"]
+    seg_count, seg_sales, day_sales = tables["clients_par_segment"], tables["ca_par_segment"], tables["ventes_par_jour"]
+    return {
+        "ventes_par_mois": px.bar(monthly, x="Month", y="Sales", title="CA par Mois", template="plotly_white"),
+        "ventes_par_produit": px.bar(products, x="Product", y="Quantity Ordered", title="Ventes par Produit", template="plotly_white"),
+        "clients_par_segment": px.bar(seg_count, x="Cluster", y="Clients", title="Clients par Segment", template="plotly_white"),
+        "ca_par_segment": px.pie(seg_sales, names="Cluster", values="Prop (%)", hole=0.4, title="Répartition du CA par Segment"),
+        "pca_segments": scatter(tables["clients"], "PCA1", "PCA2", color="Cluster",
+                                title="PCA - Segmentation Clients", template="plotly_white"),
+        "vision360_mensuel": px.bar(monthly_df, x="Month", y=["Revenue", "Expenses", "Net_Profit"], barmode="stack",
+                                    title="Analyse Mensuelle", template="plotly_white"),
+        "croissance_mensuelle": px.line(monthly_df, x="Month", y="Growth", markers=True, title="Croissance Mensuelle", template="plotly_white"),
+        "ventes_par_jour": px.pie(day_sales, names="Jour", values="Sales", hole=0.4, title="Distribution des Ventes par Jour"),
+    }
+
+
+def ra_report(data):
+    """Tables et figures du Reporting RA : payin/payout, provider, pays et statut."""
+    payin, payout = split_payin_payout(data)
+    by_provider = amount_by(data, "provider_name")
+    by_country = amount_by(data, "country")
+    by_statut = amount_by(data, "statut")
+    tables = {
+        "kpis": pd.DataFrame([ra_kpis(data, payin, payout)]),
+        "montant_par_provider": by_provider,
+        "montant_par_pays": by_country,
+        "montant_par_statut": by_statut,
+        # Agrégats au grain du cube RA : le dashboard les relit avec ses filtres
+        "cellules": ra_cells(data),
+    }
+    return tables, ra_figures(tables)
+
+
+def ra_figures(tables):
+    """Figures du Reporting RA, construites à partir des tables du rapport."""
+    by_provider, by_country, by_statut = tables["montant_par_provider"], tables["montant_par_pays"], tables["montant_par_statut"]
+    return {
+        "montant_par_provider": px.bar(by_provider, x="provider_name", y="amount", title="Montant par Provider", template="plotly_white"),
+        "montant_par_pays": px.bar(by_country, x="country", y="amount", title="Montant par Pays", template="plotly_white"),
+        "montant_par_statut": pie(by_statut, names="statut", values="amount", title="Montant par Statut"),
+    }
+
+
+# --- Écriture des sorties ---
+def _write_table(df, path):
+    try:
+        df.to_parquet(path + ".parquet", index=False)
+    except ImportError:  # pyarrow absent : repli sur CSV
+        df.to_csv(path + ".csv", index=False)
+
+
+def write_outputs(directory, title, tables, figures, formats):
+    os.makedirs(directory, exist_ok=True)
+    if "parquet" in formats:
+        for name, df in tables.items():
+            _write_table(df, os.path.join(directory, name))
+    if "html" in formats:
+        parts = [f"<h1>{title}</h1>", tables["kpis"].T.to_html(header=False)]
+        for i, fig in enumerate(figures.values()):
+            # plotly.js inclus une seule fois, depuis le CDN
+            parts.append(fig.to_html(full_html=False, include_plotlyjs="cdn" if i == 0 else False))
+        with open(os.path.join(directory, "rapport.html"), "w", encoding="utf-8") as fh:
+            fh.write(f"<html><head><meta charset='utf-8'><title>{title}</title></head><body>{''.join(parts)}</body></html>")
+    if "png" in formats:
+        if importlib.util.find_spec("kaleido") is None:  # export statique : nécessite kaleido
+            print("PNG ignorés : installer kaleido (pip install kaleido).", file=sys.stderr)
+            return
+        for name, fig in figures.items():
+            fig.write_image(os.path.join(directory, f"{name}.png"))
+
+
+# --- Relecture par les dashboards ---
+def list_reports(root, kind):
+    """Rapports (chemins relatifs à `root`, plus récents d'abord) qui contiennent la section `kind`."""
+    found = []
+    for dirpath, _, names in os.walk(root):
+        if "manifest.json" in names and os.path.isdir(os.path.join(dirpath, kind)):
+            found.append((os.path.getmtime(os.path.join(dirpath, "manifest.json")), os.path.relpath(dirpath, root)))
+    return [path for _, path in sorted(found, reverse=True)]
+
+
+def load_report(directory, kind):
+    """Manifeste et tables (Parquet ou CSV) de la section `kind` d'un rapport."""
+    with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    section = os.path.join(directory, kind)
+    tables = {}
+    for name in sorted(os.listdir(section)):
+        stem, ext = os.path.splitext(name)
+        if ext == ".parquet":
+            tables[stem] = pd.read_parquet(os.path.join(section, name))
+        elif ext == ".csv" and stem not in tables:
+            tables[stem] = pd.read_csv(os.path.join(section, name))
+    return manifest, tables
+
+
+def run(paths, output, formats=FORMATS, n_clusters=None, top_n=5, workers=None):
+    jobs = discover(paths)
+    if not jobs:
+        raise ValueError("Aucun fichier de ventes ou d'extraction RA trouvé.")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        frames = list(pool.map(_load, jobs))
+    manifest = {"fichiers": [path for _, path in jobs], "lecture_s": time.perf_counter() - start, "sections": {}}
+
+    sections = {
+        "ventes": ("Rapport des ventes", _merge_sales, lambda d: sales_report(d, n_clusters, top_n)),
+        "ra": ("Reporting Revenu Assurance", _merge_ra, ra_report),
+    }
+    for kind, (title, merge, report) in sections.items():
+        selected = [frame for (k, _), frame in zip(jobs, frames) if k == kind]
+        if not selected:
+            continue
+        step = time.perf_counter()
+        data = merge(selected)
+        tables, figures = report(data)
+        write_outputs(os.path.join(output, kind), title, tables, figures, formats)
+        manifest["sections"][kind] = {
+            "lignes": len(data),
+            "kpis": tables["kpis"].iloc[0].to_dict(),
+            "duree_s": time.perf_counter() - step,
+        }
+    with open(os.path.join(output, "manifest.json"), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, default=str, ensure_ascii=False)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="ZIP, CSV ou dossiers d'extractions")
+    parser.add_argument("-o", "--output", default="rapports")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--segments", type=int, help="nombre de segments clients (par défaut : silhouette)")
+    parser.add_argument("--top", type=int, default=5, help="nombre de combinaisons et de produits par segment")
+    parser.add_argument("--workers", type=int, help="processus de lecture (par défaut : nombre de CPU)")
+    args = parser.parse_args(argv)
+    manifest = run(args.paths, args.output, args.formats, args.segments, args.top, args.workers)
+    for kind, section in manifest["sections"].items():
+        print(f"{kind:<7} {section['lignes']:>10} lignes  {section['duree_s']:7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+
+# --- Moteur de segmentation clients ---
+# Au-delà de MINIBATCH_THRESHOLD clients, KMeans est remplacé par MiniBatchKMeans ;
+# la silhouette (quadratique) est toujours calculée sur un échantillon borné.
+MINIBATCH_THRESHOLD = 10_000
+BATCH_SIZE = 4096
+SILHOUETTE_SAMPLE = 5_000
+MEMO_SIZE = 64
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def feature_key(X):
+    """Empreinte de la matrice de caractéristiques, clé de mémoïsation des ajustements."""
+    X = np.ascontiguousarray(X)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str((X.shape, X.dtype.str)).encode())
+    h.update(X.tobytes())
+    return h.hexdigest()
+
+
+def _memoized(key, compute):
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    value = compute()
+    with _memo_lock:
+        _memo[key] = value
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return value
+
+
+def _fit(X, n_clusters, random_state):
+    if len(X) > MINIBATCH_THRESHOLD:
+        model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=BATCH_SIZE, n_init=3, random_state=random_state)
+    else:
+        model = KMeans(n_clusters=n_clusters, random_state=random_state)
+    return model.fit(X).labels_
+
+
+def fit_segments(X, n_clusters, random_state=42, key=None):
+    """Étiquettes de cluster de chaque client (mémoïsées sur la matrice et k)."""
+    key = key or feature_key(X)
+    return _memoized(("fit", key, n_clusters, random_state), lambda: _fit(X, n_clusters, random_state))
+
+
+def _score(X, k, random_state, sample_size, key):
+    labels = fit_segments(X, k, random_state, key=key)
+    sample = sample_size if sample_size < len(X) else None
+    return silhouette_score(X, labels, sample_size=sample, random_state=random_state)
+
+
+def silhouette_sweep(X, k_values=range(2, 11), random_state=42, sample_size=SILHOUETTE_SAMPLE, n_jobs=-1):
+    """Score de silhouette de chaque k candidat, évalués en parallèle."""
+    key = feature_key(X)
+    # La silhouette n'est définie que pour 2 <= k < nombre de clients
+    k_values = tuple(k for k in k_values if 2 <= k < len(X))
+
+    def compute():
+        # Threads : KMeans et les calculs de distances relâchent le GIL, X n'est pas copié
+        scores = Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(_score)(X, k, random_state, sample_size, key) for k in k_values
+        )
+        return dict(zip(k_values, scores))
+
+    return _memoized(("sweep", key, k_values, random_state, sample_size), compute)
+
+
+def best_k(scores):
+    """k au meilleur score ; None si aucun k n'est possible (2 clients ou moins)."""
+    return max(scores, key=scores.get) if scores else None
@@ -0,0 +1,203 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from features import derive_features
+
+try:
+    import duckdb
+except ImportError:  # duckdb absent : seul le moteur pandas est proposé
+    duckdb = None
+
+# --- Moteur SQL embarqué (DuckDB) ---
+# Mêmes requêtes que les cubes pandas (kpis, rollup, options), exécutées par DuckDB :
+# filtres, groupements et top-N sont poussés dans le moteur, multi-thread et hors mémoire.
+# Le chemin pandas reste la référence : compare_kpis permet de recouper les résultats.
+
+AVAILABLE = duckdb is not None
+
+SALES_EXPRESSIONS = {
+    "Month": '"Month"',
+    "Hour": '"Hour"',
+    "Product": 'CAST("Product" AS VARCHAR)',
+    "Purchase Address": 'CAST("Purchase Address" AS VARCHAR)',
+    # Colonne produite par clean_sales : « Ville (ÉT) »
+    "City": 'CAST("City" AS VARCHAR)',
+    # pandas : lundi = 0 ; isodow : lundi = 1
+    "Weekday": 'isodow("Order Date") - 1',
+}
+RA_EXPRESSIONS = {
+    "Date": '"Date"',
+    "Hour": '"Hour"',
+    "statut": 'CAST("statut" AS VARCHAR)',
+    "operation_origin": 'CAST("operation_origin" AS VARCHAR)',
+    "country": 'CAST("country" AS VARCHAR)',
+    "provider_name": 'CAST("provider_name" AS VARCHAR)',
+}
+
+
+def _param(value):
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class _DuckDBEngine:
+    table = None
+    expressions = {}
+    measures = {}
+
+    def __init__(self):
+        if duckdb is None:
+            raise ImportError("Le moteur DuckDB nécessite le paquet duckdb (pip install duckdb).")
+        self.con = duckdb.connect()
+
+    def _query(self, sql, params=()):
+        # Un curseur par requête : la connexion est partagée entre sessions Streamlit
+        return self.con.cursor().execute(sql, list(params)).df()
+
+    def _where(self, filters):
+        clauses, params = [], []
+        for dim, values in (filters or {}).items():
+            clauses.append(f"{self.expressions[dim]} IN (SELECT UNNEST(?))")
+            params.append([_param(v) for v in values])
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def rollup(self, by, measures, filters=None):
+        where, params = self._where(filters)
+        keys = ", ".join(f'{self.expressions[d]} AS "{d}"' for d in by)
+        aggs = ", ".join(f'{self.measures[m]} AS "{m}"' for m in measures)
+        order = ", ".join(str(i + 1) for i in range(len(by)))
+        return self._query(f"SELECT {keys}, {aggs} FROM {self.table} {where} GROUP BY {order} ORDER BY {order}", params)
+
+    def total(self, measure, filters=None):
+        where, params = self._where(filters)
+        value = self._query(f"SELECT {self.measures[measure]} AS v FROM {self.table} {where}", params)["v"].iloc[0]
+        return 0 if pd.isna(value) else value
+
+    def options(self, dim):
+        expr = self.expressions[dim]
+        return self._query(f"SELECT DISTINCT {expr} AS v FROM {self.table} WHERE {expr} IS NOT NULL ORDER BY 1")["v"].tolist()
+
+
+class DuckDBSales(_DuckDBEngine):
+    """Ventes nettoyées chargées dans DuckDB ; même interface que cube.SalesCube."""
+
+    table = "sales"
+    expressions = SALES_EXPRESSIONS
+    measures = {
+        "Sales": 'sum("Sales")',
+        "Quantity Ordered": 'sum("Quantity Ordered")',
+        "Orders": 'count(DISTINCT "Order ID")',
+    }
+
+    def __init__(self, data):
+        super().__init__()
+        self.con.execute("CREATE TABLE sales AS SELECT * FROM data")
+        self.months = np.array(self.options("Month"))
+
+    def kpis(self, filters=None):
+        where, params = self._where(filters)
+        row = self._query(
+            f"""SELECT sum("Sales") AS total_sales, count(DISTINCT "Order ID") AS total_orders,
+                       count(DISTINCT "Purchase Address") AS total_customers
+                FROM sales {where}""", params).iloc[0]
+        return {
+            "total_sales": 0 if pd.isna(row["total_sales"]) else row["total_sales"],
+            "total_orders": int(row["total_orders"]),
+            "total_customers": int(row["total_customers"]),
+        }
+
+    def top_product_combinations(self, size=2, top_n=5, filters=None):
+        # Auto-jointure des lignes de commande, restreinte aux paniers assez grands
+        where, params = self._where(filters)
+        joins = " ".join(
+            f"JOIN lines l{i} ON l{i}.o = l1.o AND l{i - 1}.p < l{i}.p" for i in range(2, size + 1)
+        )
+        cols = ", ".join(f"l{i}.p" for i in range(1, size + 1))
+        order = ", ".join(str(i + 1) for i in range(size))
+        df = self._query(f"""
+            WITH all_lines AS (
+                SELECT DISTINCT "Order ID" AS o, CAST("Product" AS VARCHAR) AS p FROM sales {where}
+            ),
+            lines AS (
+                SELECT * FROM all_lines WHERE o IN (SELECT o FROM all_lines GROUP BY o HAVING count(*) >= {int(size)})
+            )
+            SELECT {cols}, count(*) AS n FROM lines l1 {joins}
+            GROUP BY ALL ORDER BY n DESC, {order} LIMIT {int(top_n)}""", params)
+        return [(tuple(row[:-1]), int(row[-1])) for row in df.itertuples(index=False)]
+
+    def customer_table(self, filters=None):
+        # Mêmes colonnes que features.CustomerFeatures.table()
+        where, params = self._where(filters)
+        cust = self._query(f"""
+            WITH orders AS (
+                SELECT CAST("Purchase Address" AS VARCHAR) AS a, "Order ID" AS o, sum("Sales") AS s,
+                       sum("Quantity Ordered") AS q, max("Order Date") AS d, min("Hour") AS h
+                FROM sales {where} GROUP BY 1, 2
+            ),
+            hours AS (
+                SELECT a, h, count(*) AS n FROM orders GROUP BY 1, 2
+            ),
+            preferred AS (
+                -- Heure la plus fréquente ; à égalité, la plus matinale
+                SELECT a, arg_max(h, n * 100 - h) AS h FROM hours GROUP BY 1
+            )
+            SELECT orders.a AS "Purchase Address", sum(s) AS "Sales", count(*) AS "NbCmd",
+                   sum(q) AS "Quantity Ordered", max(d) AS "DernierAchat", any_value(preferred.h) AS "HeurePreferee"
+            FROM orders JOIN preferred USING (a) GROUP BY 1 ORDER BY 1""", params)
+        return derive_features(cust)
+
+
+class DuckDBRA(_DuckDBEngine):
+    """Transactions RA dans DuckDB ; même interface que cube.RACube."""
+
+    table = "ra"
+    expressions = RA_EXPRESSIONS
+    measures = {
+        "amount": 'sum("amount")',
+        "transactions": 'count("transaction_id")',
+    }
+
+    def __init__(self, data=None, path=None):
+        super().__init__()
+        if data is not None:
+            self.con.execute("CREATE TABLE ra AS SELECT * FROM data")
+        else:
+            # Lecture hors mémoire du CSV par DuckDB : nettoyage et dédoublonnage en SQL
+            self.con.execute("""
+                CREATE TABLE ra AS
+                WITH raw AS (
+                    SELECT row_number() OVER () AS _row, * FROM read_csv(?, all_varchar = true, encoding = 'latin-1')
+                ),
+                typed AS (
+                    SELECT * REPLACE (TRY_CAST(created_at AS TIMESTAMP) AS created_at, TRY_CAST(amount AS DOUBLE) AS amount)
+                    FROM raw
+                )
+                SELECT * EXCLUDE (_row), date_trunc('day', created_at) AS "Date", hour(created_at) AS "Hour"
+                FROM typed
+                QUALIFY row_number() OVER (PARTITION BY transaction_id ORDER BY _row) = 1
+            """, [path])
+
+    def kpis(self, filters=None):
+        return {
+            "montant_total": self.total("amount", filters),
+            "nombre_transaction": int(self.total("transactions", filters)),
+        }
+
+    def options(self, dim):
+        values = super().options(dim)
+        if dim == "Date":
+            return [pd.Timestamp(v) for v in values]
+        return values
+
+
+def compare_kpis(reference, candidate, rel_tol=1e-9):
+    """Clés dont la valeur diffère entre le moteur de référence (pandas) et le candidat."""
+    return [
+        key for key, value in reference.items()
+        if not math.isclose(float(value), float(candidate.get(key, math.nan)), rel_tol=rel_tol, abs_tol=1e-6)
+    ]
@@ -0,0 +1,149 @@
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cache import content_digest
+from cube import RACube, SalesCube, merge_ra_cells, ra_cells
+from features import CustomerFeatures
+from ingestion import SALES_CATEGORIES, clean_sales, compact_frame, concat_compact, load_sales_file, read_ra_csv
+from ra_stream import TransactionSet
+
+# --- Historique incrémental ---
+# Chaque fichier ajouté (un mois de ventes, un jour d'extraction RA) est nettoyé, dédoublonné
+# contre les identifiants déjà connus puis stocké comme une partition. Les agrégats (cube,
+# table clients) sont mis à jour à partir de la seule partition nouvelle.
+STORE_DIR = os.environ.get("REPORTING_STORE_DIR", os.path.join(os.path.expanduser("~"), ".local", "share", "reporting_streamlit"))
+# À incrémenter à chaque changement du format de l'état persisté
+STORE_VERSION = "v3"
+
+
+def _dump(obj, path):
+    # Écriture atomique : un autre processus ne lit jamais un fichier partiel
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump(obj, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class _Store:
+    """Partitions persistées sur disque et agrégats tenus à jour à chaque ajout."""
+
+    def __init__(self, name, directory=STORE_DIR):
+        self.directory = os.path.join(directory, f"{name}-{STORE_VERSION}")
+        self._lock = threading.Lock()
+        self.files = []
+        self._reset()
+        try:
+            with open(self._path("state"), "rb") as fh:
+                self.__dict__.update(pickle.load(fh))
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            pass
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.pkl")
+
+    def _state(self):
+        return {"files": self.files}
+
+    @property
+    def version(self):
+        """Empreinte du contenu : change à chaque fichier ajouté (clé des caches Streamlit)."""
+        h = hashlib.blake2b(digest_size=16)
+        for f in self.files:
+            h.update(f["digest"].encode())
+        return h.hexdigest()
+
+    def append(self, raw, name):
+        """Ajoute un fichier ; renvoie ses statistiques, ou None s'il a déjà été intégré."""
+        digest = content_digest(raw)
+        with self._lock:
+            if any(f["digest"] == digest for f in self.files):
+                return None
+            rows = self._read(raw, name)
+            fresh = self._fresh(rows)
+            rows = rows[fresh].reset_index(drop=True)
+            stats = {"fichier": name, "digest": digest, "lignes": len(rows), "doublons": int((~fresh).sum())}
+            if len(rows):
+                self._update(rows)
+            os.makedirs(self.directory, exist_ok=True)
+            _dump(rows, self._path(f"part-{len(self.files):05d}"))
+            self.files = self.files + [stats]
+            _dump(self._state(), self._path("state"))
+        return stats
+
+    def data(self):
+        """Toutes les lignes de l'historique, partitions réunies."""
+        frames = [pd.read_pickle(self._path(f"part-{i:05d}")) for i in range(len(self.files))]
+        frames = [f for f in frames if len(f)]
+        return concat_compact(frames) if frames else None
+
+    def clear(self):
+        with self._lock:
+            for i in range(len(self.files)):
+                os.remove(self._path(f"part-{i:05d}"))
+            if os.path.exists(self._path("state")):
+                os.remove(self._path("state"))
+            self.files = []
+            self._reset()
+
+
+class SalesStore(_Store):
+    """Historique des ventes : Order ID uniques, cube et table clients incrémentaux."""
+
+    def _reset(self):
+        self.order_ids = np.empty(0, dtype=np.int64)
+        self.cube = None
+        self.features = None
+
+    def _state(self):
+        return {"files": self.files, "order_ids": self.order_ids, "cube": self.cube, "features": self.features}
+
+    def _read(self, raw, name):
+        return compact_frame(clean_sales(load_sales_file(raw, name)), SALES_CATEGORIES)
+
+    def _fresh(self, rows):
+        # Une commande déjà connue est ignorée en entier ; ses lignes produit du fichier restent groupées
+        return ~np.isin(rows["Order ID"].to_numpy(), self.order_ids)
+
+    def _update(self, rows):
+        self.order_ids = np.union1d(self.order_ids, rows["Order ID"].to_numpy().astype(np.int64))
+        # Commandes disjointes : cube et caractéristiques clients sont additifs
+        cube = SalesCube(rows)
+        self.cube = cube if self.cube is None else self.cube.merge(cube)
+        features = CustomerFeatures(rows)
+        self.features = features if self.features is None else self.features.merge(features)
+
+
+class RAStore(_Store):
+    """Historique des extractions RA : transaction_id uniques, cube RA incrémental."""
+
+    def _reset(self):
+        self.transactions = TransactionSet()
+        self.cells = None
+
+    def _state(self):
+        return {"files": self.files, "transactions": self.transactions, "cells": self.cells}
+
+    def _read(self, raw, name):
+        return read_ra_csv(io.BytesIO(raw))
+
+    def _fresh(self, rows):
+        return self.transactions.add_new(rows["transaction_id"])
+
+    def _update(self, rows):
+        cells = ra_cells(rows)
+        self.cells = cells if self.cells is None else merge_ra_cells([self.cells, cells])
+
+    @property
+    def cube(self):
+        return RACube.from_cells(self.cells) if self.cells is not None else None
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from cube import Cube, RA_DIMENSIONS
+
+# --- Séries temporelles multi-granularité ---
+# Les lignes sont agrégées une seule fois à l'heure ; jour, semaine et mois sont dérivés des
+# cellules horaires, sans relire le dataset. Chaque granularité est un cuboïde du cube : les
+# filtres de la barre latérale s'appliquent comme pour les autres agrégats, et changer de
+# granularité ne relance aucun groupement sur les lignes.
+
+# Granularité -> fréquence pandas de la période
+GRANULARITIES = {"Heure": "h", "Jour": "D", "Semaine": "W-SUN", "Mois": "M"}
+# Périodes de la moyenne mobile et longueur du cycle comparé (même heure la veille, même jour
+# la semaine précédente, même semaine / même mois l'année précédente)
+ROLLING = {"Heure": 24, "Jour": 7, "Semaine": 4, "Mois": 3}
+CYCLE = {"Heure": 24, "Jour": 7, "Semaine": 52, "Mois": 12}
+
+
+def _period_start(timestamps, granularity):
+    freq = GRANULARITIES[granularity]
+    if granularity in ("Heure", "Jour"):
+        return timestamps.dt.floor(freq)
+    return timestamps.dt.to_period(freq).dt.start_time
+
+
+class TimeSeries(Cube):
+    """Cube dont chaque cuboïde porte une granularité de temps en plus des dimensions de filtre."""
+
+    def __init__(self, timestamps, dims, values):
+        others = tuple(dims.columns)
+        hours = _period_start(timestamps, "Heure").rename("Heure").reset_index(drop=True)
+        super().__init__(pd.concat([hours, dims.reset_index(drop=True)], axis=1), values, [("Heure",) + others])
+        hourly = self.cuboids[("Heure",) + others]
+        measures = list(values.columns)
+        for granularity in list(GRANULARITIES)[1:]:
+            cells = hourly.drop(columns="Heure")
+            cells.insert(0, granularity, _period_start(hourly["Heure"], granularity))
+            key = (granularity,) + others
+            self.cuboids[key] = cells.groupby(list(key), dropna=False, sort=False, observed=True)[measures].sum().reset_index()
+
+    def trend(self, granularity, measure, by=None, filters=None):
+        """Série complète (périodes sans activité à zéro), croissance, moyenne mobile et cycle précédent."""
+        dims = [granularity] + ([by] if by else [])
+        cells = self.rollup(dims, [measure], filters)
+        if cells.empty:
+            return pd.DataFrame(columns=dims + [measure, "Croissance (%)", "Moyenne mobile", "Cycle précédent", "Écart cycle (%)"])
+        wide = cells.pivot_table(index=granularity, columns=by, values=measure, aggfunc="sum", fill_value=0, observed=True) \
+            if by else cells.set_index(granularity)[[measure]]
+        periods = pd.period_range(wide.index.min(), wide.index.max(), freq=GRANULARITIES[granularity]).start_time
+        wide = wide.reindex(periods, fill_value=0)
+        # Calculs colonne par colonne sur la table large : une colonne par valeur de `by`
+        previous, cycle = wide.shift(1), wide.shift(CYCLE[granularity])
+        metrics = {
+            measure: wide,
+            "Croissance (%)": 100 * (wide - previous) / previous.replace(0, np.nan),
+            "Moyenne mobile": wide.rolling(ROLLING[granularity], min_periods=1).mean(),
+            "Cycle précédent": cycle,
+            "Écart cycle (%)": 100 * (wide - cycle) / cycle.replace(0, np.nan),
+        }
+        if not by:
+            out = pd.DataFrame({name: frame[measure] for name, frame in metrics.items()})
+        else:
+            out = pd.concat({name: frame.stack() for name, frame in metrics.items()}, axis=1)
+        out.index.names = dims
+        return out.reset_index()
+
+
+class SalesSeries(TimeSeries):
+    """CA et quantités par heure de commande, filtrables par mois et ville."""
+
+    def __init__(self, data):
+        values = data[["Sales", "Quantity Ordered"]].reset_index(drop=True)
+        super().__init__(data["Order Date"], data[["Month", "City"]], values)
+
+
+class RASeries(TimeSeries):
+    """Montants et nombre de transactions RA par heure de created_at, avec les dimensions du cube RA."""
+
+    def __init__(self, data):
+        values = pd.DataFrame({
+            "amount": data["amount"].to_numpy(),
+            "transactions": data["transaction_id"].notna().to_numpy().astype(np.int64),
+        })
+        super().__init__(data["created_at"], data[RA_DIMENSIONS], values)